@@ -0,0 +1,94 @@
+"""
+Rough performance benchmarks, run as:
+	python3 benchmark.py resample [num_synthetic_rows]
+	python3 benchmark.py processes [num_synthetic_rows]
+	python3 benchmark.py fetch [num_synthetic_rows]
+"""
+import sys
+import time
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from price_action import OHLCPriceAction, BinancePriceAction
+from process_resampling import ProcessResampler
+from kline_fetcher import KlineFetcher
+from kline_server import KlineServer
+
+FREQS = ['5min', '15min', '1h', '4h', '1d', '1w', '1m', '1y']
+
+def synthetic_pa(num_rows, resolution='1min', seed=0):
+	# random walk 1min candles, starting 2015
+	rng = np.random.default_rng(seed)
+	times = pd.Timestamp('2015-01-01').value + np.arange(num_rows, dtype=np.int64) * 60 * 10**9
+	close = 10000 + np.cumsum(rng.normal(0, 5, num_rows))
+	open = np.concatenate(([close[0]], close[:-1]))
+	spread = np.abs(rng.normal(0, 3, num_rows))
+	data = pd.DataFrame({'open': open,
+						 'high': np.maximum(open, close) + spread,
+						 'low': np.minimum(open, close) - spread,
+						 'close': close,
+						 'volume': rng.random(num_rows) * 10},
+						index=pd.DatetimeIndex(times, name='time'))
+	return OHLCPriceAction(data, resolution, label=f'synthetic_{num_rows}')
+
+def timed(function, repeats=3):
+	best = np.inf
+	for _ in range(repeats):
+		start = time.perf_counter()
+		function()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+def bench_resample(pa, repeats=3):
+	print(f'{pa.label}: {len(pa)} candles')
+	totals = {'pandas': 0, 'numpy': 0}
+	for freq in FREQS:
+		results = {}
+		for engine in totals:
+			results[engine] = timed(lambda: pa.resample(freq, engine=engine), repeats)
+			totals[engine] += results[engine]
+		print(f'	{freq:>6}: pandas {results["pandas"]*1000:9.2f}ms	numpy {results["numpy"]*1000:9.2f}ms'
+			  f'	x{results["pandas"]/results["numpy"]:.1f}')
+	print(f'	 total: pandas {totals["pandas"]*1000:9.2f}ms	numpy {totals["numpy"]*1000:9.2f}ms'
+		  f'	x{totals["pandas"]/totals["numpy"]:.1f}')
+
+def bench_processes(pa, max_processes=None):
+	# warm-up of every freq from the base data, in 1..N worker processes
+	print(f'{pa.label}: {len(pa)} candles')
+	max_processes = max_processes or os.cpu_count() or 1
+	single = None
+	for num_processes in range(1, max_processes + 1):
+		resampler = ProcessResampler(num_processes)
+		resampler.resample(pa.store[:1000], FREQS) # start the workers
+		elapsed = timed(lambda: resampler.resample(pa.store, FREQS), repeats=1)
+		resampler.shutdown()
+		single = single or elapsed
+		print(f'	{num_processes:>2} processes: {elapsed*1000:9.2f}ms	x{single/elapsed:.1f}')
+
+def bench_fetch(pa, delay=0.02, max_workers=(1, 2, 4, 8)):
+	# backfilling the whole history from a local kline server that answers after delay seconds
+	print(f'{pa.label}: {len(pa)} candles, {delay*1000:.0f}ms per request')
+	server = KlineServer({('SYNTH', '1m'): pa.store}, delay=delay).start()
+	start, end = int(pa.store.time[0]), int(pa.store.time[-1])
+	for workers in max_workers:
+		fetcher = KlineFetcher(server.url, max_workers=workers)
+		elapsed = timed(lambda: fetcher.fetch('SYNTH', '1m', start, end), repeats=1)
+		fetcher.close()
+		print(f'	{workers:>2} workers: {elapsed*1000:9.2f}ms	{len(pa)/elapsed:12.0f} candles/s')
+	server.stop()
+
+if __name__ == '__main__':
+	benchmark = sys.argv[1] if len(sys.argv) > 1 else 'resample'
+	num_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000
+	if benchmark == 'resample':
+		bench_resample(BinancePriceAction('test_candles2', '1min', 'test_candles2'), repeats=10)
+		bench_resample(synthetic_pa(num_rows), repeats=1)
+	elif benchmark == 'processes':
+		bench_processes(synthetic_pa(num_rows))
+	elif benchmark == 'fetch':
+		bench_fetch(synthetic_pa(num_rows if len(sys.argv) > 2 else 100_000))
+	else:
+		raise ValueError(benchmark)
@@ -0,0 +1,103 @@
+import json
+import os
+
+import numpy as np
+
+from candle_store import CandleStore, COLUMNS
+from resampling import resample_store, can_resample_from
+from frequencies import STANDARD_FREQS
+
+# on-disk candle archive, for histories that don't fit in memory:
+#	<archive>/meta.json			resolution, label, length, month partitions
+#	<archive>/time.bin			little endian int64 epoch seconds
+#	<archive>/open.bin ...		little endian float64, one file per column
+#	<archive>/levels/<freq>/	the same layout, resampled to freq
+# columns are opened as memory maps, so only the pages of the candles that are
+# actually looked at (e.g. the chart's window) ever get read. the partitions
+# are the first row of every month, which narrows down lookups by time.
+
+ARCHIVE_VERSION = 1
+COLUMN_DTYPES = {'time': np.dtype('<i8'), **{column: np.dtype('<f8') for column in COLUMNS}}
+LEVEL_FREQS = STANDARD_FREQS[1:] # what a 1min chart resamples to
+
+def month_partitions(time):
+	# [[month start (epoch seconds), first row of the month], ...]
+	months = time.astype('datetime64[s]').astype('datetime64[M]')
+	first_rows = np.concatenate(([0], np.flatnonzero(months[1:] != months[:-1]) + 1)) if len(time) else np.array([], dtype=np.int64)
+	month_starts = months[first_rows].astype('datetime64[s]').astype(np.int64)
+	return [[int(start), int(row)] for start, row in zip(month_starts, first_rows)]
+
+def _write_columns(directory, store, resolution, label):
+	os.makedirs(directory, exist_ok=True)
+	for column, values in zip(COLUMN_DTYPES, store.columns):
+		values.astype(COLUMN_DTYPES[column], copy=False).tofile(os.path.join(directory, f'{column}.bin'))
+	meta = {'version': ARCHIVE_VERSION, 'resolution': resolution, 'label': label, 'length': len(store),
+			'partitions': month_partitions(store.time)}
+	with open(os.path.join(directory, 'meta.json'), 'w') as file:
+		json.dump(meta, file)
+
+def write_archive(directory, pa, levels=LEVEL_FREQS, engine=None):
+	"""
+	Writes a price action and its resamples to levels into an archive.
+	The levels are resampled as a pyramid, each from the closest level below it that divides it.
+	"""
+	_write_columns(directory, pa.store, pa.resolution, pa.label)
+	written = [(pa.resolution, pa.store)]
+	for freq in levels:
+		if freq == pa.resolution:
+			continue
+		sources = [(source_freq, store) for source_freq, store in written[1:] if can_resample_from(freq, source_freq)]
+		_, source = sources[-1] if sources else written[0]
+		resampled, _ = resample_store(source, freq, engine)
+		_write_columns(os.path.join(directory, 'levels', freq), resampled, freq, pa.label)
+		written.append((freq, resampled))
+	return CandleArchive(directory)
+
+class CandleArchive:
+	"""
+	A read only, memory mapped archive written by write_archive.
+	* archive.store - CandleStore over the mapped columns
+	* archive.level(freq) - CandleArchive of a precomputed resample, or None
+	"""
+	def __init__(self, directory):
+		self.directory = directory
+		with open(os.path.join(directory, 'meta.json')) as file:
+			self.meta = json.load(file)
+		if self.meta['version'] != ARCHIVE_VERSION:
+			raise ValueError(f'unsupported candle archive version {self.meta["version"]}')
+		self.resolution = self.meta['resolution']
+		self.label = self.meta['label']
+		length = self.meta['length']
+		# np.memmap can't map empty files
+		columns = [np.memmap(os.path.join(directory, f'{column}.bin'), dtype=dtype, mode='r', shape=(length,))
+				   if length else np.empty(0, dtype=dtype) for column, dtype in COLUMN_DTYPES.items()]
+		self.store = CandleStore(*columns)
+		partitions = np.array(self.meta['partitions'], dtype=np.int64).reshape(-1, 2)
+		self.partition_starts, self.partition_rows = partitions[:,0], partitions[:,1]
+		self.opened_levels = {}
+
+	@property
+	def level_freqs(self):
+		levels_directory = os.path.join(self.directory, 'levels')
+		return sorted(os.listdir(levels_directory)) if os.path.isdir(levels_directory) else []
+
+	def level(self, freq):
+		if freq not in self.opened_levels:
+			directory = os.path.join(self.directory, 'levels', freq)
+			self.opened_levels[freq] = CandleArchive(directory) if os.path.isdir(directory) else None
+		return self.opened_levels[freq]
+
+	def window(self, start, end):
+		""" Zero-copy view of the candles with start < time < end, only touching the months in between """
+		first = max(np.searchsorted(self.partition_starts, start, side='right') - 1, 0)
+		last = np.searchsorted(self.partition_starts, end, side='right')
+		first_row = self.partition_rows[first] if len(self.partition_rows) else 0
+		last_row = self.partition_rows[last] if last < len(self.partition_rows) else len(self.store)
+		rows = self.store[first_row:last_row]
+		return rows.window(start, end)
+
+	def __len__(self):
+		return len(self.store)
+
+	def __repr__(self):
+		return f"CandleArchive({self.directory}, {len(self)} candles of {self.resolution})"
@@ -0,0 +1,157 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+Candle = namedtuple('Candle', ('time',) + COLUMNS)
+
+def _column(index):
+	# the live part of a column buffer. _length is read first, as append never
+	# swaps in buffers filled less far than the _length before them
+	def column(self):
+		length = self._length
+		return self._buffers[index][:length]
+	return property(column)
+
+class CandleStore:
+	"""
+	Columnar candle storage shared by price actions, charts and the resampler.
+	* store.time - int64 epoch seconds, sorted
+	* store.open, .high, .low, .close, .volume - contiguous float64 columns
+	Slicing gives a CandleStore of zero-copy views, an integer index gives a Candle.
+	The columns are views into buffers that can have spare capacity, see append.
+	Buffers may be shared with other stores (views, copies), so the columns are
+	never written to directly, only through append.
+	"""
+	def __init__(self, time, open, high, low, close, volume):
+		self._buffers = (np.ascontiguousarray(time, dtype=np.int64),) + \
+			tuple(np.ascontiguousarray(column, dtype=np.float64) for column in (open, high, low, close, volume))
+		self._length = len(self._buffers[0])
+		self._owns_buffers = False # the buffers may be views of someone else's data
+
+	time = _column(0)
+	open = _column(1)
+	high = _column(2)
+	low = _column(3)
+	close = _column(4)
+	volume = _column(5)
+
+	@property
+	def capacity(self):
+		return len(self._buffers[0])
+
+	def append(self, new):
+		"""
+		Appends the candles of another store in place. Candles at or after the
+		first new time are overwritten (e.g. the in-progress last candle).
+		The buffers double in capacity when full, so this is amortized O(len(new)).
+		Returns the index of the first changed candle.
+		"""
+		start = np.searchsorted(self.time, new.time[0], side='left') if len(new) else self._length
+		length = start + len(new)
+		buffers = self._buffers
+		if not self._owns_buffers or length > self.capacity:
+			buffers = self._reallocated(max(2 * length, 16), start)
+		for buffer, column in zip(buffers, new.columns):
+			buffer[start:length] = column
+		# other threads (warm-up) may read the first _length candles meanwhile, so
+		# fresh buffers only come in filled, and never with a _length beyond them
+		self._length = min(self._length, length)
+		self._buffers = buffers
+		self._length = length
+		self._owns_buffers = True
+		return start
+
+	def merge(self, new):
+		"""
+		Puts the candles of another store in by time, anywhere (e.g. into gaps),
+		replacing candles we already have at the same times. Unlike append this
+		rewrites the columns, but in one O(n) pass and nothing else is rebuilt.
+		Returns the index of the first changed candle.
+		"""
+		if len(new) == 0:
+			return self._length
+		if self._length == 0 or new.time[0] > self.time[-1]:
+			return self.append(new)
+		first_changed = int(np.searchsorted(self.time, new.time[0], side='left'))
+		positions = np.searchsorted(self.time, new.time, side='left')
+		inside = positions < self._length
+		replaced = positions[inside][self.time[positions[inside]] == new.time[inside]]
+		keep = np.ones(self._length, dtype=bool)
+		keep[replaced] = False
+		at = np.searchsorted(self.time[keep], new.time, side='left')
+		self._buffers = tuple(np.insert(column[keep], at, new_column) for column, new_column in zip(self.columns, new.columns))
+		self._length = len(self._buffers[0]) # only grows, so readers never see a _length beyond the new buffers
+		self._owns_buffers = True
+		return first_changed
+
+	def gaps(self, step):
+		# [first, last] missing time of every run of missing candles, for candles every step seconds
+		before = np.flatnonzero(np.diff(self.time) > step)
+		return np.column_stack((self.time[before] + step, self.time[before + 1] - step))
+
+	def _reallocated(self, capacity, length):
+		# fresh buffers of our own, with a copy of the first length candles
+		buffers = tuple(np.empty(capacity, dtype=buffer.dtype) for buffer in self._buffers)
+		for buffer, old_buffer in zip(buffers, self._buffers):
+			buffer[:length] = old_buffer[:length]
+		return buffers
+
+	def copy(self):
+		"""
+		Copy-on-write copy: both stores keep sharing the buffers until one of them
+		appends, which then reallocates its own (see append). Costs nothing up front.
+		"""
+		copy = CandleStore.__new__(CandleStore)
+		copy._buffers = self._buffers
+		copy._length = self._length
+		copy._owns_buffers = False
+		self._owns_buffers = False # appending in place could overwrite the copy's last candles
+		return copy
+
+	@staticmethod
+	def from_frame(data):
+		# data is a DataFrame indexed by time, with (at least) OHLCV columns
+		index = data.index
+		if not isinstance(index, pd.DatetimeIndex):
+			index = pd.to_datetime(index)
+		return CandleStore(index.asi8 // 10**9, *(data[column].values for column in COLUMNS))
+
+	def to_frame(self):
+		index = pd.DatetimeIndex(self.time * 10**9, name='time')
+		return pd.DataFrame({column: getattr(self, column) for column in COLUMNS}, index=index)
+
+	@staticmethod
+	def concatenate(stores):
+		return CandleStore(*(np.concatenate([getattr(store, column) for store in stores])
+							 for column in ('time',) + COLUMNS))
+
+	@property
+	def columns(self):
+		return (self.time, self.open, self.high, self.low, self.close, self.volume)
+
+	def __len__(self):
+		return len(self.time)
+
+	def __getitem__(self, index):
+		if isinstance(index, (int, np.integer)):
+			return Candle(*(column[index] for column in self.columns))
+		return CandleStore(*(column[index] for column in self.columns))
+
+	def window_indices(self, start, end):
+		# times are sorted, so the candles with start < time < end are a slice
+		return slice(np.searchsorted(self.time, start, side='right'),
+					 np.searchsorted(self.time, end, side='left'))
+
+	def window(self, start, end):
+		""" Zero-copy view of the candles with start < time < end """
+		return self[self.window_indices(start, end)]
+
+	def __repr__(self):
+		return f"CandleStore({len(self)} candles)"
+
+	@property
+	def nbytes(self):
+		return sum(column.nbytes for column in self.columns)
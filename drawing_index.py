@@ -0,0 +1,181 @@
+import re
+from bisect import bisect_left, bisect_right
+
+# metadata is free text, tokens are its words
+TOKEN_PATTERN = re.compile(r'\w+')
+AFTER_ALL = chr(0x10ffff) # sorts after any character, for prefix ranges
+
+def metadata_tokens(metadata):
+	return set(TOKEN_PATTERN.findall(metadata.lower())) if metadata else set()
+
+class IntervalTree:
+	"""
+	Static centered interval tree over {key: (start, end)}, for finding all the
+	keys whose interval overlaps a query in O(log n + matches).
+	"""
+	def __init__(self, intervals):
+		self.root = self._build(list(intervals.items()))
+
+	def _build(self, entries):
+		if not entries:
+			return None
+		endpoints = sorted([start for _, (start, _) in entries] + [end for _, (_, end) in entries])
+		center = endpoints[len(endpoints) // 2]
+		left = [entry for entry in entries if entry[1][1] < center]
+		right = [entry for entry in entries if entry[1][0] > center]
+		middle = [entry for entry in entries if entry[1][0] <= center <= entry[1][1]]
+		by_start = sorted(middle, key=lambda entry: entry[1][0])
+		by_end = sorted(middle, key=lambda entry: entry[1][1])
+		return (center,
+				[start for _, (start, _) in by_start], [key for key, _ in by_start],
+				[end for _, (_, end) in by_end], [key for key, _ in by_end],
+				self._build(left), self._build(right))
+
+	def overlapping(self, start, end):
+		""" The keys with an interval overlapping [start, end] """
+		found = []
+		stack = [self.root] if self.root else []
+		while stack:
+			center, starts, start_keys, ends, end_keys, left, right = stack.pop()
+			if end < center:
+				# middle intervals overlap if they start by the query's end
+				found.extend(start_keys[:bisect_right(starts, end)])
+				if left:
+					stack.append(left)
+			elif start > center:
+				# middle intervals overlap if they end after the query's start
+				found.extend(end_keys[bisect_left(ends, start):])
+				if right:
+					stack.append(right)
+			else:
+				found.extend(start_keys)
+				if left:
+					stack.append(left)
+				if right:
+					stack.append(right)
+		return found
+
+class DrawingIndex:
+	"""
+	The drawings (QQDrawings) of a Qraph, indexed for lookups that don't visit
+	each of them:
+	* index.overlapping(start, end) - drawings whose x_extent overlaps, from an IntervalTree
+	* index.matching(text) - drawings whose metadata contains text, from an inverted token index
+	  (plus the sorted tokens and token suffixes, for words that are only part of a token)
+	* index.neighbour(x, direction, drawings) - next drawing left/right by best_x_position, by bisecting
+	Extents and positions are taken when a drawing is added or updated (or
+	refreshed, e.g. after a drag); the tree and the sorted positions are
+	rebuilt lazily after changes.
+	"""
+	def __init__(self):
+		self.extents = {} # drawing -> (start, end)
+		self.positions = {} # drawing -> best_x_position
+		self.tokens = {} # token -> {drawing: None}
+		self.drawing_tokens = {} # drawing -> its tokens
+		self._sorted_tokens = None # sorted(tokens)
+		self._suffixes = None # sorted [(suffix of a token, token), ...]
+		self._tree = None
+		self._sorted = None # ([best_x_position, ...], [drawing, ...])
+
+	def add(self, drawing):
+		self.extents[drawing] = drawing.x_extent
+		self.positions[drawing] = drawing.best_x_position
+		self.drawing_tokens[drawing] = metadata_tokens(drawing.metadata)
+		for token in self.drawing_tokens[drawing]:
+			if token not in self.tokens:
+				self.tokens[token] = {}
+				self._sorted_tokens = self._suffixes = None
+			self.tokens[token][drawing] = None
+		self._tree = self._sorted = None
+
+	def remove(self, drawing):
+		del self.extents[drawing]
+		del self.positions[drawing]
+		for token in self.drawing_tokens.pop(drawing):
+			del self.tokens[token][drawing]
+			if not self.tokens[token]:
+				del self.tokens[token]
+				self._sorted_tokens = self._suffixes = None
+		self._tree = self._sorted = None
+
+	def update(self, drawing):
+		# after it's been moved or its metadata changed
+		self.remove(drawing)
+		self.add(drawing)
+
+	def is_current(self, drawing):
+		return self.extents[drawing] == drawing.x_extent and self.positions[drawing] == drawing.best_x_position
+
+	def refresh(self, drawings=None):
+		# updates the drawings (all of them by default) that moved since they were indexed
+		for drawing in [drawing for drawing in (self.extents if drawings is None else drawings)
+						if not self.is_current(drawing)]:
+			self.update(drawing)
+
+	def __contains__(self, drawing):
+		return drawing in self.extents
+
+	@property
+	def tree(self):
+		if self._tree is None:
+			self._tree = IntervalTree(self.extents)
+		return self._tree
+
+	def overlapping(self, start, end):
+		return self.tree.overlapping(start, end)
+
+	def matching(self, text):
+		"""
+		Drawings whose metadata contains text. The token index narrows it down
+		to the drawings having, for each of text's words, a token that is the
+		word (if text goes on past it on both sides), starts with it (only past
+		its start), ends with it (only past its end) or else contains it.
+		"""
+		if self._sorted_tokens is None:
+			self._sorted_tokens = sorted(self.tokens)
+			self._suffixes = sorted((token[i:], token) for token in self.tokens for i in range(len(token)))
+		candidates = None
+		lowered = text.lower()
+		for match in TOKEN_PATTERN.finditer(lowered):
+			word = match.group()
+			bounded_left, bounded_right = match.start() > 0, match.end() < len(lowered)
+			if bounded_left and bounded_right:
+				tokens = [word] if word in self.tokens else []
+			elif bounded_left:
+				tokens = self._sorted_tokens[bisect_left(self._sorted_tokens, word):
+											 bisect_left(self._sorted_tokens, word + AFTER_ALL)]
+			else:
+				# suffixes equal to the word, or starting with it
+				end = (word + '\0',) if bounded_right else (word + AFTER_ALL,)
+				tokens = [token for _, token in self._suffixes[bisect_left(self._suffixes, (word,)):
+															   bisect_left(self._suffixes, end)]]
+			with_word = {drawing for token in tokens for drawing in self.tokens[token]}
+			candidates = with_word if candidates is None else candidates & with_word
+		if candidates is None:
+			# no words in text, nothing to look up
+			return [drawing for drawing in self.extents if text in (drawing.metadata or '')]
+		return [drawing for drawing in candidates if text in drawing.metadata]
+
+	def neighbour(self, x, direction, drawings=None):
+		"""
+		The drawing next to the one closest to x, going direction ('left' or
+		'right') by best_x_position and wrapping around. Only drawings (any
+		iterable) are considered if given. None if there are none.
+		"""
+		drawings = None if drawings is None else list(drawings)
+		self.refresh(drawings) # drawings may have been dragged since, going by where they were would skip or revisit them
+		if drawings is None:
+			if self._sorted is None:
+				order = sorted(self.positions, key=self.positions.get)
+				self._sorted = ([self.positions[drawing] for drawing in order], order)
+			positions, order = self._sorted
+		else:
+			order = sorted(drawings, key=self.positions.get)
+			positions = [self.positions[drawing] for drawing in order]
+		if not order:
+			return None
+		index = bisect_left(positions, x)
+		if index == len(positions) or (index > 0 and x - positions[index - 1] <= positions[index] - x):
+			index -= 1 # the one on the left is closer
+		index += 1 if direction == 'right' else -1
+		return order[index % len(order)]
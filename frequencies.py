@@ -0,0 +1,86 @@
+from bisect import bisect_left
+
+import pandas as pd
+
+from resampling import can_resample_from
+
+# the freqs a chart can step through, smallest first
+STANDARD_FREQS = ['1min', '5min', '15min', '1h', '4h', '1d', '1w', '1m', '1y']
+
+class Freq:
+	"""
+	A frequency string ('5min', '1h', custom ones like '3min'...) parsed once:
+	* freq.secs - length in whole seconds (months and years from a common date)
+	* freq.timedelta - the same as a pd.Timedelta
+	* freq.divides(other) - True if other can be resampled from this freq
+	Freqs order by their length, so timeframe checks are integer comparisons.
+	Get them with get_freq, which keeps one Freq per string.
+	"""
+	__slots__ = ('name', 'offset', 'timedelta', 'secs', '_divides')
+
+	def __init__(self, name):
+		self.name = name
+		self.offset = pd.tseries.frequencies.to_offset(name)
+		common_dt = pd.to_datetime("2016-07-31")
+		self.timedelta = common_dt + self.offset - common_dt
+		self.secs = int(self.timedelta/pd.Timedelta('1s'))
+		self._divides = {} # other freq name -> bool
+
+	def divides(self, other):
+		other = get_freq(other)
+		if other.name not in self._divides:
+			self._divides[other.name] = can_resample_from(other.name, self.name)
+		return self._divides[other.name]
+
+	def __lt__(self, other):
+		return self.secs < get_freq(other).secs
+
+	def __le__(self, other):
+		return self.secs <= get_freq(other).secs
+
+	def __gt__(self, other):
+		return self.secs > get_freq(other).secs
+
+	def __ge__(self, other):
+		return self.secs >= get_freq(other).secs
+
+	def __repr__(self):
+		return f"Freq({self.name}, {self.secs}s)"
+
+_freqs = {} # name -> Freq
+
+def get_freq(freq):
+	# freq is a string or already a Freq
+	if isinstance(freq, Freq):
+		return freq
+	if freq is None:
+		raise ValueError('no freq') # to_offset(None) would give None, and a TypeError further on
+	if freq not in _freqs:
+		_freqs[freq] = Freq(freq)
+	return _freqs[freq]
+
+def secs_in_freq(freq):
+	return get_freq(freq).secs
+
+def timedelta_from_freq(freq):
+	return get_freq(freq).timedelta
+
+def insert_freq(freqs, custom_freq):
+	"""
+	Inserts custom_freq into the sorted list freqs where its length fits, unless
+	a freq of the same length is there already. Returns the index it's at.
+	"""
+	secs = secs_in_freq(custom_freq)
+	ladder = [secs_in_freq(freq) for freq in freqs]
+	index = bisect_left(ladder, secs)
+	if index < len(freqs) and ladder[index] == secs:
+		if freqs[index] != custom_freq:
+			raise ValueError(f'{custom_freq} is as long as {freqs[index]}')
+		return index
+	freqs.insert(index, custom_freq)
+	return index
+
+def freqs_from(freqs, smallest_freq):
+	""" The freqs at least as long as smallest_freq, starting with it (inserted if it's custom) """
+	freqs = list(freqs)
+	return freqs[insert_freq(freqs, smallest_freq):]
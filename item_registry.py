@@ -0,0 +1,183 @@
+from bisect import bisect_left, insort
+
+from frequencies import get_freq
+from drawing_index import DrawingIndex
+from qraph_tools import CandlesticksItem, QQDrawing
+
+# capability -> the method (or attribute) an item needs to have it
+CAPABILITIES = {'cuttable': 'maybe_cut_to_interval',
+				'resamplable': 'resample_to_interval',
+				'tf_scoped': 'hide_wrong_tfs',
+				'exiting': 'pre_exit_sequence',
+				'freq_bearing': 'freqs'}
+
+class TimeframeBuckets:
+	"""
+	The tf scoped drawings (see QQDrawing.hide_wrong_tfs) grouped by the length
+	of their freq. A drawing is shown on its own timeframe and lower ones, so
+	going from one timeframe to another only toggles the buckets in between,
+	and staying on the same one does nothing. A drawing's freq is taken when
+	it's added and changes go through ItemRegistry.set_freq.
+	"""
+	def __init__(self):
+		self.buckets = {} # freq secs -> {drawing: None}
+		self.bucket_secs = [] # sorted keys of buckets
+		self.drawing_secs = {} # drawing -> its bucket's key
+		self.shown_freq = None # Freq the drawings are currently shown for
+
+	def add(self, drawing):
+		secs = get_freq(drawing.freq).secs
+		if secs not in self.buckets:
+			self.buckets[secs] = {}
+			insort(self.bucket_secs, secs)
+		self.buckets[secs][drawing] = None
+		self.drawing_secs[drawing] = secs
+		if self.shown_freq is not None:
+			drawing.hide_wrong_tfs(self.shown_freq)
+
+	def remove(self, drawing):
+		secs = self.drawing_secs.pop(drawing)
+		bucket = self.buckets[secs]
+		del bucket[drawing]
+		if not bucket:
+			del self.buckets[secs]
+			self.bucket_secs.remove(secs)
+
+	def show_freq(self, freq):
+		freq = get_freq(freq)
+		if self.shown_freq is None:
+			toggled = self.bucket_secs
+		elif freq.secs == self.shown_freq.secs:
+			return
+		else:
+			low, high = sorted((freq.secs, self.shown_freq.secs))
+			toggled = self.bucket_secs[bisect_left(self.bucket_secs, low):bisect_left(self.bucket_secs, high)]
+		for secs in toggled:
+			visible = freq.secs <= secs
+			for drawing in self.buckets[secs]:
+				drawing.set_on_timeframe(visible)
+		self.shown_freq = freq
+
+class ItemRegistry:
+	"""
+	The items of a Qraph's plot areas, indexed by capability and by name when
+	they are added or removed, so nothing has to probe every item:
+	* registry.of(capability, plot_area) - e.g. the cuttable items of a plot area
+	* registry.candlesticks(plot_area=None) - the CandlesticksItems
+	* registry.drawings() - the QQDrawings
+	* registry.named(name) - the item called name, if any
+	* registry.timeframes - the tf scoped items in TimeframeBuckets
+	* registry.drawing_index - the drawings in a DrawingIndex
+	* registry.unculled(plot_area) - the drawings that aren't culled, see cull/uncull
+	Items keep their insertion order (dicts as ordered sets).
+	"""
+	def __init__(self):
+		self.plot_areas = {} # item -> plot area
+		self.indexes = {} # (capability, plot area) -> {item: None}
+		self.names = {} # name -> item
+		self.timeframes = TimeframeBuckets() # the tf scoped items by freq
+		self.drawing_index = DrawingIndex()
+		self.unculled_drawings = {} # plot area -> {drawing: None}, the ones not culled
+
+	def add(self, item, plot_area):
+		self.plot_areas[item] = plot_area
+		for capability in self.capabilities(item):
+			self.indexes.setdefault((capability, plot_area), {})[item] = None
+		if hasattr(item, 'hide_wrong_tfs'):
+			self.timeframes.add(item)
+		if isinstance(item, QQDrawing):
+			self.drawing_index.add(item)
+			self.unculled_drawings.setdefault(plot_area, {})[item] = None
+		name = getattr(item, 'name', None)
+		if name is not None:
+			self.names[name] = item
+
+	def remove(self, item):
+		plot_area = self.plot_areas.pop(item)
+		for capability in self.capabilities(item):
+			self.indexes[(capability, plot_area)].pop(item, None)
+		if hasattr(item, 'hide_wrong_tfs'):
+			self.timeframes.remove(item)
+		if isinstance(item, QQDrawing):
+			self.drawing_index.remove(item)
+			self.unculled_drawings[plot_area].pop(item, None)
+		name = getattr(item, 'name', None)
+		if self.names.get(name) is item:
+			del self.names[name]
+		return plot_area
+
+	def rename(self, item, name):
+		if self.names.get(getattr(item, 'name', None)) is item:
+			del self.names[item.name]
+		item.name = name
+		if name is not None:
+			self.names[name] = item
+
+	def set_freq(self, item, freq):
+		# moves it to its new timeframe bucket; a bad freq raises ValueError before anything is moved
+		freq = get_freq(freq)
+		if item in self.timeframes.drawing_secs:
+			self.timeframes.remove(item)
+			item.freq = freq.name
+			self.timeframes.add(item)
+		else:
+			item.freq = freq.name
+
+	def set_metadata(self, item, metadata):
+		item.metadata = metadata
+		if item in self.drawing_index:
+			self.drawing_index.update(item)
+
+	def unculled(self, plot_area):
+		return list(self.unculled_drawings.get(plot_area, ()))
+
+	def cull(self, drawing):
+		# hides it (see QQDrawing.set_culled), it stays in the scene and registered
+		del self.unculled_drawings[self.plot_areas[drawing]][drawing]
+		drawing.set_culled(True)
+
+	def uncull(self, drawing):
+		unculled = self.unculled_drawings[self.plot_areas[drawing]]
+		if drawing not in unculled:
+			unculled[drawing] = None
+			drawing.set_culled(False)
+
+	def remove_plot_area(self, plot_area):
+		for item in self.items(plot_area):
+			self.remove(item)
+		self.unculled_drawings.pop(plot_area, None)
+
+	@staticmethod
+	def capabilities(item):
+		capabilities = [capability for capability, attribute in CAPABILITIES.items() if hasattr(item, attribute)]
+		if isinstance(item, CandlesticksItem):
+			capabilities.append('candlesticks')
+		if isinstance(item, QQDrawing):
+			capabilities.append('drawing')
+		return capabilities
+
+	def of(self, capability, plot_area=None):
+		# items with capability, of one plot area or of all of them
+		if plot_area is not None:
+			return list(self.indexes.get((capability, plot_area), ()))
+		return [item for (index_capability, _), items in self.indexes.items() if index_capability == capability
+				for item in items]
+
+	def candlesticks(self, plot_area=None):
+		return self.of('candlesticks', plot_area)
+
+	def drawings(self, plot_area=None):
+		return self.of('drawing', plot_area)
+
+	def named(self, name):
+		return self.names.get(name)
+
+	def items(self, plot_area):
+		# all of its items, in the order they were added
+		return [item for item, area in self.plot_areas.items() if area is plot_area]
+
+	def plot_area_of(self, item):
+		return self.plot_areas.get(item)
+
+	def __contains__(self, item):
+		return item in self.plot_areas
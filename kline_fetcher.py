@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from klines import parse_klines, KLINE_FIELDS
+
+BINANCE_URL = 'https://api.binance.com'
+KLINE_LIMIT = 1000 # most klines binance returns per request
+INTERVAL_UNIT_SECS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400, 'M': 31 * 86400} # months only roughly
+
+def interval_secs(interval):
+	# '1m' -> 60, '4h' -> 14400, ...
+	return int(interval[:-1]) * INTERVAL_UNIT_SECS[interval[-1]]
+
+class KlineFetcher:
+	"""
+	Fetches binance klines over one pooled session (connections are reused
+	between requests and charts). A range is split into disjoint chunks of one
+	request each, which are fetched concurrently, and paginated in case a chunk
+	still comes back full. Times are epoch seconds, both ends inclusive.
+	"""
+	def __init__(self, base_url=BINANCE_URL, max_workers=4, timeout=10, retries=3):
+		self.base_url = base_url
+		self.timeout = timeout
+		self.session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retries)
+		self.session.mount('http://', adapter)
+		self.session.mount('https://', adapter)
+		self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='klines')
+
+	def fetch_page(self, symbol, interval, start, end, limit=KLINE_LIMIT):
+		""" One request, at most limit klines as a (n, 12) array """
+		params = {'symbol': symbol, 'interval': interval, 'startTime': start * 1000, 'endTime': end * 1000, 'limit': limit}
+		response = self.session.get(f'{self.base_url}/api/v3/klines', params=params, timeout=self.timeout)
+		response.raise_for_status()
+		return parse_klines(response.content)
+
+	def fetch_range(self, symbol, interval, start, end):
+		# sequential pages until the range is covered
+		pages = []
+		while start <= end:
+			page = self.fetch_page(symbol, interval, start, end)
+			if len(page) == 0:
+				break
+			pages.append(page)
+			last_open = int(page[-1, 0]) // 1000
+			if len(page) < KLINE_LIMIT or last_open + interval_secs(interval) > end: # no more in the range
+				break
+			start = last_open + 1
+		return np.concatenate(pages) if pages else np.empty((0, KLINE_FIELDS))
+
+	def fetch(self, symbol, interval, start, end):
+		""" All klines with start <= open time <= end, as a (n, 12) array """
+		return self.fetch_ranges(symbol, interval, [(start, end)])
+
+	def fetch_ranges(self, symbol, interval, ranges):
+		"""
+		All klines in a list of (start, end) ranges (e.g. gaps to backfill), as
+		one sorted (n, 12) array. The ranges are fetched concurrently.
+		"""
+		chunk = interval_secs(interval) * KLINE_LIMIT
+		chunks = [(chunk_start, min(chunk_start + chunk - 1, end))
+				  for start, end in ranges for chunk_start in range(int(start), int(end) + 1, chunk)]
+		pages = list(self.executor.map(lambda bounds: self.fetch_range(symbol, interval, *bounds), chunks))
+		klines = np.concatenate(pages) if pages else np.empty((0, KLINE_FIELDS))
+		return klines[np.argsort(klines[:,0], kind='stable')]
+
+	def close(self):
+		self.executor.shutdown()
+		self.session.close()
+
+_shared_fetcher = None
+_shared_fetcher_lock = threading.Lock()
+
+def shared_fetcher():
+	# one session and thread pool for all price actions
+	global _shared_fetcher
+	with _shared_fetcher_lock:
+		if _shared_fetcher is None:
+			_shared_fetcher = KlineFetcher()
+		return _shared_fetcher
@@ -0,0 +1,81 @@
+"""
+A local stand-in for the binance kline endpoint (GET /api/v3/klines), for
+tests and benchmarks that shouldn't touch the network. Run as:
+	python3 kline_server.py [port] [kline_file]
+"""
+import json
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from kline_fetcher import interval_secs, KLINE_LIMIT
+
+class KlineServer:
+	"""
+	Serves CandleStores as binance klines: stores is {(symbol, interval): store}.
+	delay (seconds) is added to every response, to act like a remote server.
+	"""
+	def __init__(self, stores, port=0, delay=0):
+		self.stores = stores
+		self.delay = delay
+		self.requests = 0
+		server = self
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				server.handle(self)
+			def log_message(self, *args):
+				pass
+		self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+		self.httpd.daemon_threads = True
+		self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+	def start(self):
+		threading.Thread(target=self.httpd.serve_forever, name='kline-server', daemon=True).start()
+		return self
+
+	def stop(self):
+		self.httpd.shutdown()
+		self.httpd.server_close()
+
+	def klines(self, symbol, interval, start_ms, end_ms, limit):
+		store = self.stores[(symbol, interval)]
+		first = np.searchsorted(store.time, -(-start_ms // 1000), side='left')
+		last = min(np.searchsorted(store.time, end_ms // 1000, side='right'), first + limit)
+		step_ms = interval_secs(interval) * 1000
+		return [[int(t) * 1000, f'{o:.8f}', f'{h:.8f}', f'{l:.8f}', f'{c:.8f}', f'{v:.8f}', int(t) * 1000 + step_ms - 1,
+				 f'{v * c:.8f}', 0, '0', '0', '0']
+				for t, o, h, l, c, v in zip(*(column[first:last] for column in store.columns))]
+
+	def handle(self, request):
+		self.requests += 1
+		url = urlparse(request.path)
+		query = {key: values[0] for key, values in parse_qs(url.query).items()}
+		if url.path != '/api/v3/klines' or (query.get('symbol'), query.get('interval')) not in self.stores:
+			return self._respond(request, 400, {'code': -1121, 'msg': 'Invalid symbol.'})
+		limit = min(int(query.get('limit', 500)), KLINE_LIMIT)
+		start_ms = int(query.get('startTime', 0))
+		end_ms = int(query.get('endTime', 2**62))
+		if self.delay:
+			time.sleep(self.delay)
+		self._respond(request, 200, self.klines(query['symbol'], query['interval'], start_ms, end_ms, limit))
+
+	@staticmethod
+	def _respond(request, status, body):
+		content = json.dumps(body, separators=(',', ':')).encode()
+		request.send_response(status)
+		request.send_header('Content-Type', 'application/json')
+		request.send_header('Content-Length', str(len(content)))
+		request.end_headers()
+		request.wfile.write(content)
+
+if __name__ == '__main__':
+	from klines import load_klines
+	port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+	kline_file = sys.argv[2] if len(sys.argv) > 2 else 'test_candles2'
+	server = KlineServer({('BTCUSDT', '1m'): load_klines(kline_file)}, port=port)
+	print(f'serving {kline_file} as BTCUSDT 1m klines on {server.url}')
+	server.httpd.serve_forever()
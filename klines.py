@@ -0,0 +1,130 @@
+import json
+import os
+import warnings
+
+import numpy as np
+
+from candle_store import CandleStore, COLUMNS
+
+# binance kline rows: otime (ms), open, high, low, close, volume, ctime (ms),
+# quote_volume, num_trades, taker_base_volume, taker_quote_volume, ignore
+KLINE_FIELDS = 12
+
+# kline json files get a sidecar directory (<file>.columns) with one raw .npy
+# per CandleStore column, which is memory mapped on the next load instead of
+# parsing the json again. meta.json holds the size and mtime of the json the
+# columns were made from, so a changed file is parsed (and cached) again.
+SIDECAR_SUFFIX = '.columns'
+SIDECAR_VERSION = 1
+
+def parse_klines(text):
+	"""
+	Parses the json of a list of binance klines (an api response or a dump of
+	them) into a (num_klines, 12) float64 array, without any python objects per value.
+	"""
+	if isinstance(text, str):
+		text = text.encode()
+	# with the brackets and quotes gone it's just comma separated numbers
+	text = text.translate(None, b'[]"').strip(b', \t\r\n')
+	with warnings.catch_warnings():
+		warnings.simplefilter('error', DeprecationWarning) # numpy only warns about unparsable data
+		try:
+			values = np.fromstring(text, sep=',')
+		except DeprecationWarning:
+			raise ValueError('not a list of klines')
+	if len(values) % KLINE_FIELDS != 0:
+		raise ValueError(f'not a list of klines ({len(values)} values)')
+	return values.reshape(-1, KLINE_FIELDS)
+
+def klines_to_store(candles):
+	return CandleStore(candles[:,0].astype(np.int64) // 1000, *candles[:,1:6].T)
+
+def load_klines(path, use_sidecar=True):
+	""" CandleStore of a kline json file, memory mapped from its sidecar if that is up to date """
+	if use_sidecar:
+		store = read_sidecar(path)
+		if store is not None:
+			return store
+	meta = _source_meta(path) # before reading, so a file changed meanwhile isn't taken as cached
+	with open(path, 'rb') as file:
+		text = file.read()
+	store = klines_to_store(parse_klines(text[:_last_kline_end(text) or 0])) # a collector may be mid-write
+	if use_sidecar:
+		write_sidecar(path, store, meta)
+	return store
+
+def _last_kline_end(text):
+	# index just past the last ']' that closes a kline rather than the list
+	# (klines have no nested brackets), None if there is no complete kline
+	end = len(text)
+	while True:
+		end = text.rfind(b']', 0, end)
+		if end < 0:
+			return None
+		before = end - 1
+		while before >= 0 and text[before:before + 1].isspace():
+			before -= 1
+		if before >= 0 and text[before:before + 1] not in (b']', b'['):
+			return end + 1
+
+def kline_file_end(path, tail_size=4096):
+	# byte offset just past the last complete kline of a file, where appended klines start
+	with open(path, 'rb') as file:
+		size = file.seek(0, os.SEEK_END)
+		file.seek(max(size - tail_size, 0))
+		tail = file.read()
+	end = _last_kline_end(tail)
+	return size - len(tail) + end if end is not None else 0
+
+def read_new_klines(path, offset):
+	"""
+	Parses only the klines appended to a kline file since offset (see kline_file_end),
+	e.g. by a collector that keeps writing ',[...]]' over the closing bracket.
+	Returns (klines, new offset), or None if the file shrank, i.e. was rewritten.
+	"""
+	with open(path, 'rb') as file:
+		size = file.seek(0, os.SEEK_END)
+		if size < offset:
+			return None
+		file.seek(offset)
+		text = file.read()
+	end = _last_kline_end(text) # a partly written kline is left for the next time
+	if end is None:
+		return np.empty((0, KLINE_FIELDS)), offset
+	return parse_klines(text[:end]), offset + end
+
+def sidecar_path(path):
+	return str(path) + SIDECAR_SUFFIX
+
+def _source_meta(path):
+	stat = os.stat(path)
+	return {'version': SIDECAR_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def read_sidecar(path):
+	# None if there is no sidecar or it was made from a different file
+	directory = sidecar_path(path)
+	try:
+		with open(os.path.join(directory, 'meta.json')) as file:
+			meta = json.load(file)
+		if meta != _source_meta(path):
+			return None
+		# read only maps; the store copies them once it gets appended to
+		columns = [np.load(os.path.join(directory, f'{column}.npy'), mmap_mode='r') for column in ('time',) + COLUMNS]
+	except (OSError, ValueError):
+		return None
+	return CandleStore(*columns)
+
+def write_sidecar(path, store, meta=None):
+	# best effort, e.g. the data could be in a read only directory
+	directory = sidecar_path(path)
+	meta_path = os.path.join(directory, 'meta.json')
+	try:
+		os.makedirs(directory, exist_ok=True)
+		if os.path.exists(meta_path):
+			os.remove(meta_path) # so half written columns are never taken as valid
+		for column, values in zip(('time',) + COLUMNS, store.columns):
+			np.save(os.path.join(directory, f'{column}.npy'), values)
+		with open(meta_path, 'w') as file:
+			json.dump(meta or _source_meta(path), file)
+	except OSError as error:
+		print(f'could not write the kline sidecar for {path}: {error}')
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from pyqtgraph import QtCore
+
+class LiveScheduler(QtCore.QObject):
+	"""
+	Keeps every live chart up to date from one asyncio loop in one background
+	thread: it wakes right after candles close (each chart's period, aligned to
+	the clock), fetches the new candles of all due charts concurrently, and
+	hands them to the gui thread in one batch, where they get appended.
+	Charts also get the holes in their history fetched once, when subscribed.
+	"""
+	sigBatch = QtCore.Signal(object) # [(chart, new candles), ...]
+	sigBackfill = QtCore.Signal(object, object) # chart, the candles of its gaps
+
+	def __init__(self, settle=0.5, max_workers=4):
+		QtCore.QObject.__init__(self)
+		self.settle = settle # seconds after a boundary, so the candle is closed at the source
+		self.max_workers = max_workers # threads for the blocking fetches, however many charts there are
+		self.due_times = {} # chart -> when it gets fetched next
+		self.periods = {} # chart -> seconds
+		self.lock = threading.Lock()
+		self.loop = None
+		self.changed = None # asyncio.Event, set when charts come or go
+		self.sigBatch.connect(self.deliver) # queued, this lives in the gui thread
+		self.sigBackfill.connect(self.deliver_backfill)
+
+	def subscribe(self, chart, period=None):
+		# chart is a CandlesticksItem, period defaults to its price action's update_interval
+		period = period or chart.initial_pa.update_interval
+		with self.lock:
+			self.periods[chart] = period
+			self.due_times[chart] = self.next_boundary(time.time(), period)
+			if self.loop is None:
+				self._start()
+		self.loop.call_soon_threadsafe(self.changed.set)
+		self.backfill(chart)
+
+	def unsubscribe(self, chart):
+		with self.lock:
+			self.periods.pop(chart, None)
+			self.due_times.pop(chart, None)
+
+	def backfill(self, chart):
+		# fetches the candles missing from chart's history in the background, they're merged in the gui thread
+		gaps = chart.initial_pa.gaps # here, as only the gui thread changes the candles
+		if len(gaps) != 0:
+			asyncio.run_coroutine_threadsafe(self._backfill(chart, gaps), self.loop)
+
+	async def _backfill(self, chart, gaps):
+		try:
+			candles = await asyncio.to_thread(chart.initial_pa.fetch_ranges, gaps)
+		except Exception as error:
+			print(f'backfilling {chart.initial_pa.label} failed:')
+			traceback.print_exception(error)
+			return
+		if len(candles) != 0:
+			self.sigBackfill.emit(chart, candles)
+
+	def next_boundary(self, now, period):
+		return (now // period + 1) * period + self.settle
+
+	def _start(self):
+		self.loop = asyncio.new_event_loop()
+		self.loop.set_default_executor(ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='live-fetch'))
+		self.changed = asyncio.Event()
+		ready = threading.Event()
+		def run():
+			asyncio.set_event_loop(self.loop)
+			self.loop.call_soon(ready.set)
+			self.loop.run_until_complete(self._run())
+		threading.Thread(target=run, name='live-scheduler', daemon=True).start()
+		ready.wait()
+
+	async def _run(self):
+		while True:
+			self.changed.clear() # before looking, so no (un)subscribing is missed
+			with self.lock:
+				next_due = min(self.due_times.values(), default=None)
+			timeout = None if next_due is None else max(next_due - time.time(), 0)
+			try:
+				await asyncio.wait_for(self.changed.wait(), timeout) # woken early by (un)subscribing
+				continue
+			except asyncio.TimeoutError:
+				pass
+			now = time.time()
+			with self.lock:
+				due = [chart for chart, due_time in self.due_times.items() if due_time <= now]
+				for chart in due:
+					self.due_times[chart] = self.next_boundary(now, self.periods[chart])
+			results = await asyncio.gather(*(asyncio.to_thread(chart.initial_pa.fetch_new) for chart in due),
+										   return_exceptions=True)
+			batch = []
+			for chart, result in zip(due, results):
+				if isinstance(result, Exception):
+					print(f'updating {chart.initial_pa.label} failed:')
+					traceback.print_exception(result)
+				elif len(result) != 0:
+					batch.append((chart, result))
+			if batch:
+				self.sigBatch.emit(batch)
+
+	def deliver(self, batch):
+		# in the gui thread
+		for chart, candles in batch:
+			if chart in self.periods: # not closed in the meantime
+				chart.append_candles(candles)
+
+	def deliver_backfill(self, chart, candles):
+		# in the gui thread
+		if chart in self.periods:
+			chart.merge_candles(candles)
+
+_shared_scheduler = None
+
+def shared_scheduler():
+	# one scheduler (and thread) for all live charts; create it from the gui thread
+	global _shared_scheduler
+	if _shared_scheduler is None:
+		_shared_scheduler = LiveScheduler()
+	return _shared_scheduler
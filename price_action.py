@@ -1,17 +1,26 @@
+import copy
 import math
 import numpy as np
 import pandas as pd
 import requests
 import time
 
+from candle_store import CandleStore
+from resampling import resample_store
+from klines import load_klines, klines_to_store, kline_file_end, read_new_klines
+from candle_archive import CandleArchive
+from kline_fetcher import shared_fetcher
+
 class OHLCPriceAction:
 	""" 
-	Data must be pandas df and contain an index named "time".
-	* price_action.data - pandas DataFrame (functional)
-	* price_action.array - numpy ndarray (fast)
-	price_action[] accesses the array.
+	Data must be pandas df and contain an index named "time", or a CandleStore.
+	* price_action.data - pandas DataFrame (functional, built on demand)
+	* price_action.store - CandleStore (fast)
+	price_action[] accesses the store.
 	TODO: simplify
 	"""
+	update_interval = 60 # seconds between update() calls when charted live, see LiveCandleItem
+
 	def __init__(self, data, resolution='1min', label="no_label"):
 		# TODO: determine; for now we rely on .resample() setting this
 		# NB: this can probably be done w pd.infer_freq(data.index), just needs testing
@@ -22,53 +31,63 @@ class OHLCPriceAction:
 
 	@property
 	def data(self):
-		return self._data
+		return self.store.to_frame()
 
 	@data.setter
 	def data(self, data):
-		if not isinstance(data.index, pd.DatetimeIndex):
-			data.index = pd.to_datetime(data.index)
-		self._data = data
-		self.array = data.to_records()
-		self.array.flags.writeable = False
+		if isinstance(data, CandleStore):
+			self.store = data
+		else:
+			self.store = CandleStore.from_frame(data)
 
 	def copy(self):
-		return OHLCPriceAction(self.data, self.resolution, self.label)
+		# same attributes (label, data_source, ...), copy-on-write candles, see CandleStore.copy
+		pa = copy.copy(self)
+		pa.store = self.store.copy()
+		return pa
+
+	def append(self, new_data):
+		"""
+		Appends a CandleStore of new candles, replacing the ones we have from
+		the first new time on. Costs O(new candles), not O(history).
+		Returns the index of the first changed candle.
+		"""
+		return self.store.append(new_data)
 
 	def __repr__(self):
 		range_ = f"range {self.range}"
 		return f"PA({self.label}); {range_}"
 
 	def __getitem__(self, index):
-		return self.array[index]
+		return self.store[index]
+
+	def __len__(self):
+		return len(self.store)
 
 	@property
 	def time(self):
-		return self[-1]["time"]
+		return self[-1].time
 
 	@property
 	def range(self):
 		""" Returns min and max of time """
-		return [self[0].time, self[-1].time]
+		return [np.datetime64(int(self[0].time), 's'), np.datetime64(int(self[-1].time), 's')]
 
-	def resample(self, freq, cut_partial_candles=False):
+	def resample(self, freq, cut_partial_candles=False, engine=None):
 		# see https://stackoverflow.com/questions/24635721/how-to-compare-frequencies-sampling-rates-in-pandas
 		common_dt = pd.to_datetime("2016-07-31") #date choice is important, this is not random.
 		assert common_dt + pd.tseries.frequencies.to_offset(freq) >= \
 			   common_dt + pd.tseries.frequencies.to_offset(self.resolution)
-		ohlc_transform = {"open": "first", "high": "max", "low": "min",
-						  "close": "last", "volume": "sum"}
-		counts = self.data.close.resample(freq).count()
-		data = self.data.resample(freq).agg(ohlc_transform)
+		store, counts = resample_store(self.store, freq, engine)
 
 		if cut_partial_candles:
-			full_bin = counts.iloc[-2]	# assume that the new freq is divisible by 1 minute
-			first_bin, last_bin = counts.iloc[0], counts.iloc[-1]
+			full_bin = counts[-2]	# assume that the new freq is divisible by 1 minute
+			first_bin, last_bin = counts[0], counts[-1]
 			idxs = slice(0 if first_bin == full_bin else 1,
 						 None if last_bin == full_bin else -1)
-			pa = OHLCPriceAction(data[idxs], freq, self.label)
+			pa = OHLCPriceAction(store[idxs], freq, self.label)
 		else:
-			pa = OHLCPriceAction(data, freq, self.label)
+			pa = OHLCPriceAction(store, freq, self.label)
 		return pa
 
 	def save_object(self):
@@ -82,25 +101,56 @@ class OHLCPriceAction:
 		return pa
 
 	def update(self):
+		""" Fetches newer candles in place, returns the index of the first changed candle """
+		candles = self.fetch_new()
+		if len(candles) == 0:
+			return len(self)
+		# the refetched candles replace the ones we already had
+		return self.append(candles)
+
+	def fetch_new(self):
+		"""
+		CandleStore of the candles from the last one we have (which may have
+		changed) on, without adding them; see update and live_scheduler.
+		"""
 		raise NotImplementedError()
 
+	def cached_level(self, freq):
+		# a precomputed resample to freq, if the source has one (see ArchivedPriceAction)
+		return None
+
+	@property
+	def resolution_secs(self):
+		return int(pd.Timedelta(pd.tseries.frequencies.to_offset(self.resolution)).total_seconds())
+
+	@property
+	def gaps(self):
+		""" Missing candles at the resolution, as an (n, 2) array of [first, last] missing time """
+		return self.store.gaps(self.resolution_secs)
+
+	def fetch_ranges(self, ranges):
+		""" CandleStore of the candles in (start, end) time ranges (inclusive), from the source """
+		raise NotImplementedError()
+
+	def backfill_gaps(self):
+		"""
+		Fetches only the missing candles (see gaps) and splices them in.
+		Returns the index of the first changed candle.
+		"""
+		gaps = self.gaps
+		if len(gaps) == 0:
+			return len(self)
+		return self.store.merge(self.fetch_ranges(gaps))
+
 class BinancePriceAction(OHLCPriceAction):
-	def __init__(self, data_source, resolution='1min', label="no_label", symbol=None):
+	def __init__(self, data_source, resolution='1min', label="no_label", symbol=None, fetcher=None):
 		self.data_source = data_source
 		self.symbol = symbol
-		candles = open(data_source, 'r').read()
-		candles = candles.strip('][').replace('"', "").split("],[")
-		candles = [[float(value) for value in candle.split(",")] for candle in candles]
-		candles = np.array(candles)
-		candles[:,0] = candles[:,0]*1000000
+		self.fetcher = fetcher or shared_fetcher() # kline_fetcher.KlineFetcher, e.g. pointed at a kline_server
 		# TODO: otime or ctime?
-		data = pd.DataFrame(candles, index=candles[:,0], columns=['otime', 'open', 'high', 'low', 'close', 'volume', 'ctime', 'quote_volume', 'num_trades', 'taker_buy_base_volume', 'taker_buy_quote_volume', 'unused_field'])
-		data.index.rename('time', inplace=True)
+		data = load_klines(data_source)
 		super().__init__(data, resolution, label)
 
-
-	def copy(self):
-		return BinancePriceAction(self.data_source, self.resolution, self.label, self.symbol)
 	
 	def save_object(self):
 		return {'label': self.label,
@@ -114,26 +164,20 @@ class BinancePriceAction(OHLCPriceAction):
 		return pa
 	
 	def update(self):
+		try:
+			return super().update()
+		except (requests.RequestException, ValueError) as error:
+			print(f"updating {self.label} failed: {error}")
+			return len(self)
+
+	def fetch_new(self):
 		end = int((pd.Timestamp(time.time()*1e9)-pd.Timedelta('1min')).timestamp())
-		start = int((pd.Timestamp(self.data.index[-1])-pd.Timedelta('1min')).timestamp())
+		start = int(self.time) - 60
+		# paginated, so any minutes missed while offline are backfilled too
+		return self.fetch_ranges([(start, end)])
 
-		gettable_string=f"https://api.binance.com/api/v3/klines?symbol={self.symbol}&interval={self.binance_interval}&startTime={start*1000}&endTime={end*1000}"
-		candles = requests.get(gettable_string)
-		candles = candles.json()
-		import pdb
-		try:
-			candles = np.array(candles, dtype=float)
-		except:
-			print("updating chart failed; debugging")
-			pdb.set_trace()
-
-		candles[:,0] = candles[:,0]*1000000
-		new_data = pd.DataFrame(candles, index=candles[:,0], columns=['otime', 'open', 'high', 'low', 'close', 'volume', 'ctime', 'quote_volume', 'num_trades', 'taker_buy_base_volume', 'taker_buy_quote_volume', 'unused_field'])
-		new_data.index.rename('time', inplace=True)
-
-		total_data = pd.concat([self.data, new_data], axis=0)
-		
-		self.data = total_data
+	def fetch_ranges(self, ranges):
+		return klines_to_store(self.fetcher.fetch_ranges(self.symbol, self.binance_interval, ranges))
 	
 	@property
 	def binance_interval(self):
@@ -142,3 +186,55 @@ class BinancePriceAction(OHLCPriceAction):
 		else:
 			return self.resolution
 
+class KlineFilePriceAction(BinancePriceAction):
+	"""
+	Follows a kline file that a collector keeps appending to: fetch_new() parses
+	only the klines written since the last read, so it is cheap enough to poll.
+	Chart it live (regularly_update) and LiveScheduler polls it every update_interval.
+	"""
+	update_interval = 1
+
+	def __init__(self, data_source, resolution='1min', label="no_label", symbol=None, fetcher=None):
+		self.offset = kline_file_end(data_source) # before loading, so nothing appended meanwhile is skipped
+		super().__init__(data_source, resolution, label, symbol, fetcher)
+
+	def fetch_new(self):
+		new_klines = read_new_klines(self.data_source, self.offset)
+		if new_klines is None:
+			# rewritten rather than appended to, take it all again
+			self.offset = kline_file_end(self.data_source)
+			return load_klines(self.data_source)
+		candles, self.offset = new_klines
+		return klines_to_store(candles)
+
+	def gen_from_save_object(o):
+		return KlineFilePriceAction(o['data_source'], o['initial_resolution'], o['label'], o['symbol'])
+
+class ArchivedPriceAction(OHLCPriceAction):
+	"""
+	Price action over a candle_archive on disk. The candles are memory mapped
+	instead of loaded, and the archive's levels are used instead of resampling,
+	so only what gets looked at is ever read.
+	"""
+	def __init__(self, archive_directory, label=None):
+		self.archive_directory = archive_directory
+		self.archive = CandleArchive(archive_directory)
+		self.levels_stale = False # set once candles get appended, the levels don't have them
+		super().__init__(self.archive.store, self.archive.resolution, label or self.archive.label)
+
+	def append(self, new_data):
+		self.levels_stale = True
+		return super().append(new_data)
+
+	def cached_level(self, freq):
+		level = self.archive.level(freq)
+		if level is None or self.levels_stale:
+			return None
+		return OHLCPriceAction(level.store, freq, self.label)
+
+	def save_object(self):
+		return {'label': self.label,
+				'archive_directory': self.archive_directory}
+
+	def gen_from_save_object(o):
+		return ArchivedPriceAction(o['archive_directory'], o['label'])
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from candle_store import CandleStore
+from resampling import resample_store
+
+# optional multi-core resampling for very large histories: the base candles are
+# put into shared memory once, every worker process attaches to them and
+# resamples a different freq (or instrument), and writes its result into a new
+# shared memory block. only block names and lengths go through pickling.
+# the workers are started by a fork server (spawned where there's none), not
+# forked from the gui process, whose other threads may hold locks at fork time.
+# like with any spawning, a script that uses a ProcessResampler has to start its
+# gui under `if __name__ == '__main__':`, as the workers import the main module.
+
+class SharedCandleBuffer:
+	"""
+	The columns of a CandleStore laid out one after the other in a shared memory block
+	"""
+	def __init__(self, shm, length):
+		self.shm = shm
+		self.length = length
+		self.name = shm.name
+
+	@staticmethod
+	def create(store):
+		length = len(store)
+		shm = shared_memory.SharedMemory(create=True, size=max(6 * length * 8, 1))
+		buffer = SharedCandleBuffer(shm, length)
+		for column, values in zip(buffer.store.columns, store.columns):
+			column[:] = values
+		return buffer
+
+	@staticmethod
+	def attach(name, length):
+		return SharedCandleBuffer(shared_memory.SharedMemory(name=name), length)
+
+	@property
+	def store(self):
+		# views into the shared block, only valid while it is open
+		n = self.length
+		time = np.ndarray(n, dtype=np.int64, buffer=self.shm.buf)
+		others = [np.ndarray(n, dtype=np.float64, buffer=self.shm.buf, offset=(index + 1) * n * 8) for index in range(5)]
+		return CandleStore(time, *others)
+
+	def copy_store(self):
+		# one memcpy per column, so the block can be released
+		return CandleStore(*(column.copy() for column in self.store.columns))
+
+	def close(self, unlink=False):
+		self.shm.close()
+		if unlink:
+			self.shm.unlink()
+
+def _resample_shared(name, length, freq, engine):
+	# runs in a worker process
+	base = SharedCandleBuffer.attach(name, length)
+	try:
+		resampled, _ = resample_store(base.store, freq, engine)
+		result = SharedCandleBuffer.create(resampled)
+		result.close() # the parent unlinks it once it has the data
+		return result.name, result.length
+	finally:
+		base.close()
+
+class ProcessResampler:
+	"""
+	Resamples stores to several freqs on separate cores.
+	Every freq is resampled straight from the base data (no pyramid, see
+	CandlesticksItem._memoized_resample_pa), since the levels run in parallel.
+	"""
+	def __init__(self, num_processes=None, engine=None):
+		self.num_processes = num_processes or os.cpu_count() or 1
+		self.engine = engine
+		self.pool = None
+
+	def _get_pool(self):
+		if self.pool is None:
+			# never fork, this process runs qt, live update, fetch and warm-up threads
+			context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+			if context.get_start_method() == 'forkserver':
+				context.set_forkserver_preload(['process_resampling']) # workers fork with numpy and pandas imported
+			self.pool = ProcessPoolExecutor(max_workers=self.num_processes, mp_context=context)
+		return self.pool
+
+	def resample(self, store, freqs):
+		""" Returns {freq: resampled store} """
+		return self.resample_many([(store, freqs)])[0]
+
+	def resample_many(self, jobs):
+		"""
+		jobs is a list of (store, freqs), e.g. one per instrument.
+		Returns a list of {freq: resampled store}, in the order of jobs.
+		"""
+		pool = self._get_pool()
+		bases = [SharedCandleBuffer.create(store) for store, _ in jobs]
+		try:
+			futures = [{freq: pool.submit(_resample_shared, base.name, base.length, freq, self.engine) for freq in freqs}
+					   for base, (_, freqs) in zip(bases, jobs)]
+			results = []
+			for job_futures in futures:
+				resampled = {}
+				for freq, future in job_futures.items():
+					result = SharedCandleBuffer.attach(*future.result())
+					resampled[freq] = result.copy_store()
+					result.close(unlink=True)
+				results.append(resampled)
+			return results
+		finally:
+			for base in bases:
+				base.close(unlink=True)
+
+	def shutdown(self):
+		if self.pool is not None:
+			self.pool.shutdown()
+			self.pool = None
@@ -8,7 +8,7 @@ from functools import lru_cache
 from pathlib import Path
 import pudb
 
-from PySide6 import QtWidgets
+from PySide6 import QtWidgets, QtCore, QtGui
 import pandas as pd
 import numpy as np
 import PySide6
@@ -18,7 +18,9 @@ from PySide6.QtWidgets import QFileDialog
 
 from price_action import OHLCPriceAction, BinancePriceAction
 import DrawingState
-from qraph_tools import timedelta_from_freq, secs_in_freq, reformat_pa_data, CandlesticksItem, \
+from item_registry import ItemRegistry
+from frequencies import STANDARD_FREQS, get_freq, secs_in_freq
+from qraph_tools import CandlesticksItem, LiveCandleItem, \
 	QQFieldItem, QQTargetItem, Trendline, LineSystem, QQRRItem, QQGraphicsLineItem, QQDrawing
 # from qraphui import Ui_MainWindow
 from qraphui2 import Ui_MainWindow
@@ -32,7 +34,7 @@ class Qraph(QtWidgets.QMainWindow):
 		self.assure_life()
 		super(Qraph, self).__init__(parent=parent)
 		self.set_style()
-		self.freqs = ['1min', '5min', '15min', '1h', '4h', '1d', '1w', '1m', '1y']
+		self.freqs = list(STANDARD_FREQS)
 		self.sharex = sharex
 		self.live_updates = live_updates
 
@@ -44,8 +46,20 @@ class Qraph(QtWidgets.QMainWindow):
 		self.active_drawing = None
 		self.drawing_state = DrawingState.IDLE
 		self.plot_areas = [] # instances of horizontally spanning plots
+		self.registry = ItemRegistry() # items by capability and name, kept up to date by add_item/remove_item
+		self.max_unculled_drawings = 100 # more than this shown and the ones far off the view get culled
 		self.plot_size_policy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Minimum) #TODO: think this is wrong
 
+		# viewbox changes come many times per frame while zooming, so they are
+		# only reacted to once per frame, with the latest interval of each plot area
+		self.pending_viewbox_changes = {} # plot_area -> (viewbox, interval)
+		screen = QtGui.QGuiApplication.primaryScreen()
+		refresh_rate = screen.refreshRate() if screen and screen.refreshRate() > 0 else 60
+		self.viewbox_change_timer = QtCore.QTimer(self)
+		self.viewbox_change_timer.setSingleShot(True)
+		self.viewbox_change_timer.setInterval(int(1000 / refresh_rate))
+		self.viewbox_change_timer.timeout.connect(self.react_to_pending_viewbox_changes)
+
 		plot_area = self.create_plot_area()
 		self.setup_buttons()
 		self.setup_metadata()
@@ -67,9 +81,8 @@ class Qraph(QtWidgets.QMainWindow):
 
 		if key == 'delete':
 			if self.active_drawing:
-				for plot_area in self.plot_areas:
-					if self.active_drawing in plot_area.items:
-						plot_area.removeItem(self.active_drawing)
+				if self.active_drawing in self.registry:
+					self.remove_item(self.active_drawing)
 				self.unset_active_drawing()
 		elif key == 's':
 			self.ui.channel_system.setChecked(True)
@@ -132,6 +145,7 @@ class Qraph(QtWidgets.QMainWindow):
 		connections = np.zeros(len(xs)).astype(int)
 		warnings.simplefilter(action='ignore', category=FutureWarning) #TODO: good idea or not? doing single line doesnt work
 		p = plot_area.plot(xs, ys, symbolPen=color1, symbolBrush=color2, symbol=symbol, connect=connections)
+		self.registry.add(p, plot_area)
 
 		p.setZValue(100)
 
@@ -161,7 +175,7 @@ class Qraph(QtWidgets.QMainWindow):
 			plots = self.add_plots(data, plot_area)
 			viewbox.autoRange(items=plots)
 			for plot in plots:
-				plot_area.removeItem(plot)
+				self.remove_item(plot)
 			#disableAutoRange(axis=None) might b needed afterwards if I delete the things
 		else:
 			plots = self.add_plot(data, plot_area)
@@ -173,7 +187,7 @@ class Qraph(QtWidgets.QMainWindow):
 			else:
 				viewbox.autoRange(items=plots)
 				for plot in plots:
-					plot_area.removeItem(plot)
+					self.remove_item(plot)
 		# trigger resampling, since this zooming does not trigger viewbox events
 		interval = viewbox.viewRange()[0] # the x interval
 		# for plot in plot_area.items:
@@ -226,26 +240,28 @@ class Qraph(QtWidgets.QMainWindow):
 	def add_line(self, data, plot_area_index=None, color='b', width=2):
 		plot_area = self.derive_plot_area(plot_area_index)
 		xs, ys = self.format_data_for_line(data)
-		return [plot_area.plot(x = xs, y = ys, pen=pg.mkPen(color = color, width = width))]
+		line = plot_area.plot(x = xs, y = ys, pen=pg.mkPen(color = color, width = width))
+		self.registry.add(line, plot_area)
+		return [line]
 
 	def add_text_item(self, text, anchor, plot_area_index=None):
 		plot_area = self.derive_plot_area(plot_area_index)
 		print("WARNING: TEXT ITEMS DONT TRANSFORM TO LOG SCALE PROPERLY")
 		t = pg.TextItem(text, color='b', anchor=(0, 0))
 		t.setPos(anchor[0], anchor[1])
-		plot_area.addItem(t)
+		self.add_item(t, plot_area)
 
 	def add_hline(self, pos, plot_area_index=None, label=None):
 		raise NotImplementedError()
 		plot_area = self.derive_plot_area(plot_area_index)
 		hline = pg.InfiniteLine(pos=pos, movable=True, label=label, angle=0)
-		plot_area.addItem(hline)
+		self.add_item(hline, plot_area)
 
 	def add_vline(self, pos, plot_area_index=None, label=None):
 		raise NotImplementedError()
 		plot_area = self.derive_plot_area(plot_area_index)
 		vline = pg.InfiniteLine(pos=pos, movable=True, label=label, angle=90)
-		plot_area.addItem(vline)
+		self.add_item(vline, plot_area)
 
 	def setup_metadata(self):
 		self.ui.connection_state.setText("")
@@ -317,42 +333,34 @@ class Qraph(QtWidgets.QMainWindow):
 
 	def handle_side_button_click(self, direction):
 		assert direction in ['left', 'right']
-		relevant_drawings = []
 		selection_string = self.ui.drawing_metadata.text()
-		for plot_area in self.plot_areas:
-			for item in plot_area.items:
-				if isinstance(item, QQDrawing):
-					if selection_string in item.metadata:
-						relevant_drawings.append(item)
+		index = self.registry.drawing_index
+		relevant_drawings = index.matching(selection_string) if selection_string else None # None is all of them
 		viewbox = self.plot_areas[0].getViewBox()
 		current_x_range = viewbox.viewRange()[0]  # [[xmin, xmax], [ymin, ymax]]
 		current_x_pos = (current_x_range[0] + current_x_range[1])/2
+		drawing = index.neighbour(current_x_pos, direction, relevant_drawings)
+		if drawing is not None:
+			self.center_on_drawing(drawing)
 
-		min_distance = np.inf
-		closest_drawing_index = 0
-		for index, drawing in enumerate(relevant_drawings):
-			pos = drawing.best_x_position
-			if abs(pos - current_x_pos) < min_distance:
-				min_distance = abs(pos - current_x_pos)
-				closest_drawing_index = index
-
-		if direction == 'right':
-			if closest_drawing_index == len(relevant_drawings) - 1:
-				self.zoom(relevant_drawings[0])
-			else:
-				self.zoom(relevant_drawings[closest_drawing_index + 1])
-		else:
-			# if closest_drawing_index == 0:
-			#	  closest_drawing_index = len(relevant_drawings) - 1
-			self.zoom(relevant_drawings[closest_drawing_index - 1])
+	def center_on_drawing(self, drawing):
+		# keeps the zoom, only moves the view
+		viewbox = self.plot_areas[0].getViewBox()
+		x_min, x_max = viewbox.viewRange()[0]
+		half_width = (x_max - x_min)/2
+		viewbox.setXRange(drawing.best_x_position - half_width, drawing.best_x_position + half_width, padding=0)
 
 	def set_drawing_freq(self):
 		if self.active_drawing:
-			self.active_drawing.freq = self.ui.drawing_freq.text()
+			try:
+				self.registry.set_freq(self.active_drawing, self.ui.drawing_freq.text())
+			except ValueError as error:
+				print(f'invalid freq {self.ui.drawing_freq.text()!r}: {error}')
+				self.ui.drawing_freq.setText(self.active_drawing.freq)
 
 	def set_drawing_metadata(self):
 		if self.active_drawing:
-			self.active_drawing.metadata = self.ui.drawing_metadata.text()
+			self.registry.set_metadata(self.active_drawing, self.ui.drawing_metadata.text())
 
 	def test_color(self, color_button):
 		if not self.active_drawing:
@@ -382,11 +390,9 @@ class Qraph(QtWidgets.QMainWindow):
 	def default_chart_name(self):
 		name = ''
 		assert len(self.plot_areas) == 1, "genning default name doesnt work with multiple charts"
-		for area in self.plot_areas:
-			for item in area.items:
-				if isinstance(item, CandlesticksItem):
-					name += item.initial_pa.label.replace('1min', '').replace('1m', '')
-					name += item.initial_pa.resolution
+		for item in self.registry.candlesticks():
+			name += item.initial_pa.label.replace('1min', '').replace('1m', '')
+			name += item.initial_pa.resolution
 		name += str(math.floor(time.time()/60)) #minutes since epoch, bc there's no way I need seconds and thats just too long
 		return name
 
@@ -411,7 +417,7 @@ class Qraph(QtWidgets.QMainWindow):
 		charts = self.charts_from_save_object(save_object)
 		plot_area = self.create_plot_area()
 		for chart in charts:
-			plot_area.addItem(chart)
+			self.add_item(chart, plot_area)
 #		self.add_plots(charts, plot_area)
 		self.last_save_url = url
 		self.reset_available_freqs()
@@ -421,10 +427,11 @@ class Qraph(QtWidgets.QMainWindow):
 	def delete_all_current_charts(self):
 		# just deletes everything
 		for plot_area in self.plot_areas:
-			for chart in plot_area.items:
-				if hasattr(chart, 'pre_exit_sequence'):
-					# closes candlestick updating threads
-					chart.pre_exit_sequence()
+			for chart in self.registry.of('exiting', plot_area):
+				# stops live updates and warm-ups
+				chart.pre_exit_sequence()
+			self.registry.remove_plot_area(plot_area)
+			self.pending_viewbox_changes.pop(plot_area, None)
 			plot_area.scene().sigMouseClicked.disconnect() #lambda event: self.react_to_mouse_click(event, plot_area))
 			self.vertical_plot_container.removeItem(plot_area)
 			plot_area.parent = None
@@ -436,7 +443,7 @@ class Qraph(QtWidgets.QMainWindow):
 	def handle_line_system_button_click(self, pressed_in):
 		if not pressed_in:
 			self.drawing_state = DrawingState.IDLE
-			self.get_drawing("active_line_system").name = None
+			self.rename_item(self.get_drawing("active_line_system"), None)
 
 	def resample_button_click(self, freq):
 		#TODO: cancel resampling to bad resolutions
@@ -446,27 +453,60 @@ class Qraph(QtWidgets.QMainWindow):
 		self.hide_irrelevant_drawings(freq)
 
 	def hide_irrelevant_drawings(self, freq):
-		for area in self.plot_areas:
-			for drawing in area.items:
-				if hasattr(drawing, 'hide_wrong_tfs'):
-					drawing.hide_wrong_tfs(freq)
+		if freq is not None: # no charts
+			self.registry.timeframes.show_freq(freq)
+
+	def schedule_viewbox_change(self, viewbox, interval, plot_area):
+		# until the frame's reaction, the view just transforms what's already drawn
+		self.last_interval = interval
+		self.pending_viewbox_changes[plot_area] = (viewbox, interval)
+		if not self.viewbox_change_timer.isActive():
+			self.viewbox_change_timer.start()
+
+	def react_to_pending_viewbox_changes(self):
+		pending, self.pending_viewbox_changes = self.pending_viewbox_changes, {}
+		for plot_area, (viewbox, interval) in pending.items():
+			if plot_area in self.plot_areas:
+				self.react_to_viewbox_change(viewbox, interval, plot_area)
 
 	def react_to_viewbox_change(self, viewbox, interval, plot_area):
 		auto_resample = self.ui.auto_resample.isChecked()
 		self.last_interval = interval # Used for manual resampling purposes (for cutting) TODO: probably can remove and just use the current viewbox?
 		# CUT THE SIDES FOR PERFORMANCE REASONS:
-		for plot in plot_area.items:
-			if hasattr(plot, 'maybe_cut_to_interval'):
-				plot.maybe_cut_to_interval(interval)
+		for plot in self.registry.of('cuttable', plot_area):
+			plot.maybe_cut_to_interval(interval)
+		self.cull_drawings(interval, plot_area)
 		# RESAMPLE:
 		if auto_resample:
-			for plot in plot_area.items:
-				if hasattr(plot, 'resample_to_interval'):
-					plot.resample_to_interval(interval)
-				if hasattr(plot, 'hide_wrong_tfs'):
-					plot.hide_wrong_tfs(self.current_freq())
+			for plot in self.registry.of('resamplable', plot_area):
+				plot.resample_to_interval(interval)
+			self.hide_irrelevant_drawings(self.current_freq()) # no-op unless the timeframe changed
 			self.update_current_freq()
 
+	def cull_drawings(self, interval, plot_area):
+		"""
+		Hides the drawings far off the view (see ItemRegistry.cull), so painting
+		grows with what's visible rather than with all the drawings. Drawings
+		within half a view of it get unculled, ones more than a view away get
+		culled (the gap in between stops them flickering in and out). Nothing
+		gets culled while only a few drawings are unculled.
+		Culling only toggles visibility: adding and removing scene items over
+		and over crashes PySide6 (a refcount bug in QGraphicsScene).
+		"""
+		index = self.registry.drawing_index
+		width = interval[1] - interval[0]
+		keep_start, keep_end = interval[0] - width, interval[1] + width
+		unculled = self.registry.unculled(plot_area)
+		for drawing in unculled if len(unculled) > self.max_unculled_drawings else ():
+			start, end = drawing.x_extent # may have been dragged since it was indexed
+			if (end < keep_start or start > keep_end) and drawing is not self.active_drawing:
+				if not index.is_current(drawing):
+					index.update(drawing)
+				self.registry.cull(drawing)
+		for drawing in index.overlapping(interval[0] - width/2, interval[1] + width/2):
+			if self.registry.plot_area_of(drawing) is plot_area:
+				self.registry.uncull(drawing)
+
 	def react_to_brand_new_viewbox_interval(self, interval, plot_area):
 		print('reacting to new viewbox interval')
 		"""
@@ -474,30 +514,26 @@ class Qraph(QtWidgets.QMainWindow):
 		continuous changes). Yes, it really is necessary.
 		"""
 		# CUT THE SIDES FOR PERFORMANCE REASONS:
-		for plot in plot_area.items:
-			if hasattr(plot, 'maybe_cut_to_interval'):
-				plot.maybe_cut_to_interval(interval)
+		for plot in self.registry.of('cuttable', plot_area):
+			plot.maybe_cut_to_interval(interval)
+		self.cull_drawings(interval, plot_area)
 		# RESAMPLE:
-		for plot in plot_area.items:
-			if hasattr(plot, 'resample_to_interval_abrupt'):
-				plot.resample_to_interval_abrupt(interval)
-				plot.generatePicture()
-				plot.update() #todo: not sure putting this and generatePicture here makes much sense.
-			if hasattr(plot, 'hide_wrong_tfs'):
-				plot.hide_wrong_tfs(self.current_freq())
+		for plot in self.registry.of('resamplable', plot_area):
+			plot.resample_to_interval_abrupt(interval)
+			plot.generatePicture()
+			plot.update() #todo: not sure putting this and generatePicture here makes much sense.
+		self.hide_irrelevant_drawings(self.current_freq())
 		self.update_current_freq()
 
 	def update_current_freq(self):
 		# TODO: a major performance enchancement would be having items call this from themselves.
 		# TODO: this is dirty
-		for plot_area in self.plot_areas:
-			for item in plot_area.items:
-				if isinstance(item, CandlesticksItem):
-					freq = item.freq
-					if freq in self.freqs:
-						getattr(self.ui, 'resample_'+freq).setChecked(True)
-						self.ui.custom_resample.setText(freq)
-						return
+		for item in self.registry.candlesticks():
+			freq = item.freq
+			if freq in self.freqs:
+				getattr(self.ui, 'resample_'+freq).setChecked(True)
+				self.ui.custom_resample.setText(freq)
+				return
 
 	def resample_plots(self, freq):
 		for plot_area in self.plot_areas:
@@ -507,9 +543,8 @@ class Qraph(QtWidgets.QMainWindow):
 		# loop through all plotted things inside the plot_area.
 		# if has a price_action, resample that shit.
 		# if has a line chart, resample that too I guess (not to be implemented yet)
-		for item in plot_area.items:
-			if isinstance(item, CandlesticksItem):
-				item.resample(freq, self.last_interval)
+		for item in self.registry.candlesticks(plot_area):
+			item.resample(freq, self.last_interval)
 
 	def load_user_interface(self):
 		self.ui = Ui_MainWindow()
@@ -523,7 +558,7 @@ class Qraph(QtWidgets.QMainWindow):
 		plot.setAxisItems({'bottom': da}) # makes unix secs look like proper times
 		plot.setLogMode(False, True)
 		plot.scene().sigMouseClicked.connect(lambda event: self.react_to_mouse_click(event, plot))
-		plot.sigXRangeChanged.connect(lambda viewbox, interval: self.react_to_viewbox_change(viewbox, interval, plot))
+		plot.sigXRangeChanged.connect(lambda viewbox, interval: self.schedule_viewbox_change(viewbox, interval, plot))
 
 		self.plot_areas.append(plot)
 
@@ -546,20 +581,18 @@ class Qraph(QtWidgets.QMainWindow):
 			copied_pa.resolution = pa.resolution
 			majority_chart = CandlesticksItem(copied_pa, regularly_update=False)
 
-		plot_area.addItem(majority_chart, clipToView=True)# ???
+		self.add_item(majority_chart, plot_area, clipToView=True)# ???
 		majority_chart.setZValue(90)
 
 		self.ui.instrument.setItemText(0, pa.label) #TODO: switchable
 		self.reset_available_freqs()
 
 		if self.live_updates:
-			pa = majority_chart.initial_pa
-			copied_pa = pa.copy()
-			copied_pa.data = copied_pa.data[-2:] 
-			updating_part = CandlesticksItem(copied_pa, regularly_update=True)
-			plot_area.addItem(updating_part, clipToView=True)# ???
-			updating_part.setZValue(90)
-			return [majority_chart, updating_part]
+			# only the last candle is redrawn on updates, and it fetches the new candles into majority_chart
+			live_candle = LiveCandleItem(majority_chart)
+			self.add_item(live_candle, plot_area)
+			live_candle.setZValue(91)
+			return [majority_chart, live_candle]
 		else:
 			return [majority_chart]
 
@@ -613,6 +646,8 @@ class Qraph(QtWidgets.QMainWindow):
 		assert len(self.plot_areas) == 1, "saving more than 1 plot will (almost certainly) break"
 		for plot_area in self.plot_areas:
 			for plot_item in plot_area.items:
+				if isinstance(plot_item, LiveCandleItem):
+					continue # dont save the updating part of a chart
 				if isinstance(plot_item, CandlesticksItem):
 					if plot_item.regularly_update:
 						continue # dont save the updating part of a chart
@@ -647,19 +682,19 @@ class Qraph(QtWidgets.QMainWindow):
 	def handle_adding_rr_tool(self, last_click_position, plot_area):
 		if self.drawing_state == DrawingState.IDLE:
 			point = QQTargetItem(last_click_position, name="first_RR_drawing_point", freq=self.current_freq())
-			plot_area.addItem(point)
+			self.add_item(point, plot_area)
 			self.drawing_state = DrawingState.DRAWING_RR_1
 		elif self.drawing_state == DrawingState.DRAWING_RR_1:
 			point = QQTargetItem(last_click_position, name="second_RR_drawing_point", freq=self.current_freq())
-			plot_area.addItem(point)
+			self.add_item(point, plot_area)
 			self.drawing_state = DrawingState.DRAWING_RR_2
 		elif self.drawing_state == DrawingState.DRAWING_RR_2:
 			p1 = self.get_drawing("first_RR_drawing_point")
 			p2 = self.get_drawing("second_RR_drawing_point")
-			plot_area.removeItem(p1)
-			plot_area.removeItem(p2)
+			self.remove_item(p1)
+			self.remove_item(p2)
 			rr_tool = QQRRItem(p1.pos(), p2.pos(), last_click_position, freq=self.current_freq())
-			plot_area.addItem(rr_tool)
+			self.add_item(rr_tool, plot_area)
 			self.set_active_drawing(rr_tool)
 			self.drawing_state = DrawingState.IDLE
 			self.ui.rr_tool.setChecked(False)
@@ -669,15 +704,15 @@ class Qraph(QtWidgets.QMainWindow):
 		print('drawing boxes is not really implemented properly atm')
 		if self.drawing_state == DrawingState.IDLE:
 			point = QQTargetItem(last_click_position, name="first_box_drawing_point")
-			plot_area.addItem(point)
+			self.add_item(point, plot_area)
 			self.drawing_state = DrawingState.DRAWING_BOX
 		elif self.drawing_state == DrawingState.DRAWING_BOX:
 			point = self.get_drawing("first_box_drawing_point")
-			plot_area.removeItem(point)
+			self.remove_item(point)
 			roi = pg.ROI(point.pos(), (abs(point.x - last_click_position.x()), abs(point.y - last_click_position.y())), removable=True, pen=pg.mkPen('g', width=2), handlePen=pg.mkPen('b', width=2))
 			roi.addScaleHandle((0,0), (1,1))
 			roi.addScaleHandle((1,1), (0,0))
-			plot_area.addItem(roi)
+			self.add_item(roi, plot_area)
 			self.ui.box.setChecked(False)
 			self.drawing_state = DrawingState.IDLE
 		else:
@@ -690,19 +725,19 @@ class Qraph(QtWidgets.QMainWindow):
 			self.drawing_state = DrawingState.IDLE ##might seem weird but necessary
 		elif self.drawing_state == DrawingState.IDLE:
 			if self.has_drawing("first_trendline_drawing_point"):
-				plot_area.removeItem(self.get_drawing("first_trendline_drawing_point"))
+				self.remove_item(self.get_drawing("first_trendline_drawing_point"))
 			point = QQTargetItem(last_click_position, name="first_trendline_drawing_point", freq=self.current_freq())
-			plot_area.addItem(point)
+			self.add_item(point, plot_area)
 			self.drawing_state = DrawingState.DRAWING_TRENDLINE
 		elif self.drawing_state == DrawingState.DRAWING_TRENDLINE:
 			point = self.get_drawing("first_trendline_drawing_point")
-			plot_area.removeItem(point)
+			self.remove_item(point)
 
 			constructed_trendline = Trendline(point.pos(), last_click_position, color=self.ui.color_button.color(),
 											  width=self.ui.thickness_spinner.value(), freq=self.current_freq())
 
 			sys = LineSystem(constructed_trendline, name="active_line_system", freq=self.current_freq())
-			plot_area.addItem(sys)
+			self.add_item(sys, plot_area)
 			self.set_active_drawing(sys)
 
 			self.drawing_state = DrawingState.IDLE
@@ -710,15 +745,24 @@ class Qraph(QtWidgets.QMainWindow):
 			raise ValueError(self.drawing_state)
 
 	def get_drawing(self, name):
-		search_space = sum([plot.items for plot in self.plot_areas], [])
-		matches = [i for i in search_space if hasattr(i, 'name') and i.name == name]
-		assert len(matches) == 1, f"no matches or too many matches: {len(matches)}"
-		return matches[0]
+		drawing = self.registry.named(name)
+		assert drawing is not None, f"no drawing named {name}"
+		return drawing
 
 	def has_drawing(self, name):
-		search_space = sum([plot.items for plot in self.plot_areas], [])
-		matches = [i for i in search_space if hasattr(i, 'name') and i.name == name]
-		return len(matches)>0
+		return self.registry.named(name) is not None
+
+	def add_item(self, item, plot_area, **kwargs):
+		# everything goes through here (and remove_item), so the registry stays up to date
+		plot_area.addItem(item, **kwargs)
+		self.registry.add(item, plot_area)
+
+	def remove_item(self, item):
+		plot_area = self.registry.remove(item)
+		plot_area.removeItem(item)
+
+	def rename_item(self, item, name):
+		self.registry.rename(item, name)
 
 	def handle_drawing_trend_line(self, last_click_position, plot_area):
 		# TODO: drawing states might be useless - can be derived using the
@@ -727,18 +771,18 @@ class Qraph(QtWidgets.QMainWindow):
 		# other issues.
 		if self.drawing_state == DrawingState.IDLE:
 			if self.has_drawing("first_trendline_drawing_point"):
-				plot_area.removeItem(self.get_drawing("first_trendline_drawing_point"))
+				self.remove_item(self.get_drawing("first_trendline_drawing_point"))
 			point = QQTargetItem(last_click_position, name="first_trendline_drawing_point", freq=self.current_freq())
-			plot_area.addItem(point)
+			self.add_item(point, plot_area)
 			self.drawing_state = DrawingState.DRAWING_TRENDLINE
 
 		elif self.drawing_state == DrawingState.DRAWING_TRENDLINE:
 			point = self.get_drawing("first_trendline_drawing_point")
-			plot_area.removeItem(point)
+			self.remove_item(point)
 
 			constructed_trendline = Trendline(point.pos(), last_click_position, color=self.ui.color_button.color(),
 											  width=self.ui.thickness_spinner.value(), freq=self.current_freq())
-			plot_area.addItem(constructed_trendline)
+			self.add_item(constructed_trendline, plot_area)
 			self.set_active_drawing(constructed_trendline)
 			self.ui.trend_line.setChecked(False)
 			self.drawing_state = DrawingState.IDLE
@@ -746,15 +790,8 @@ class Qraph(QtWidgets.QMainWindow):
 			raise ValueError(self.drawing_state)
 
 	def reset_available_freqs(self):
-		smallest_available_freq = None
-		for plot_area in self.plot_areas:
-			for item in plot_area.items:
-				if hasattr(item, 'freqs'):
-					if not smallest_available_freq:
-						smallest_available_freq = item.freqs[0]
-					else:
-						if secs_in_freq(smallest_available_freq) > secs_in_freq(item.freqs[0]):
-							smallest_available_freq = item.freqs
+		smallest_available_freq = min((item.freqs[0] for item in self.registry.of('freq_bearing')), key=secs_in_freq,
+									  default=None)
 		if not smallest_available_freq:
 			return
 		self.change_freqs_from_smallest_available_freq(smallest_available_freq)
@@ -763,15 +800,9 @@ class Qraph(QtWidgets.QMainWindow):
 
 	def current_freq(self):
 		assert len(self.plot_areas) == 1, "only single plot area current freq supported rn"
-		for area in self.plot_areas:
-			for item in area.items:
-				if isinstance(item, CandlesticksItem):
-					return item.freq
+		for item in self.registry.candlesticks():
+			return item.freq
 
 	def change_freqs_from_smallest_available_freq(self, smallest_available_freq):
-		if smallest_available_freq in self.freqs:
-			self.freqs = self.freqs[self.freqs.index(smallest_available_freq):]
-		else:
-			for index, freq in enumerate(self.freqs):
-				if secs_in_freq(smallest_available_freq) > secs_in_freq(freq):
-					self.freqs = self.freqs[index:]
+		smallest_available_freq = get_freq(smallest_available_freq)
+		self.freqs = [freq for freq in self.freqs if get_freq(freq) >= smallest_available_freq]
@@ -1,6 +1,6 @@
 import math
-import time
 import warnings
+from collections import OrderedDict
 from functools import lru_cache
 import pdb
 import pudb
@@ -12,11 +12,15 @@ import pyqtgraph as pg
 from PySide6.QtCore import QLineF
 from PySide6.QtWidgets import QGraphicsLineItem
 from pyqtgraph import QtCore, QtGui, TargetItem, Point, UIGraphicsItem, GraphicsObject
-import pandas as pd
 from price_action import OHLCPriceAction, BinancePriceAction
+from resampling import resample_tail
+from frequencies import STANDARD_FREQS, get_freq, secs_in_freq, insert_freq, freqs_from
+from candle_store import CandleStore
+from warmup import shared_executor, WarmupToken
+from live_scheduler import shared_scheduler
 import importlib
 price_action = importlib.import_module("price_action")
-import _thread
+import threading
 
 # TODO: systematic log mode handling (perhaps newer pyqthgraph would help)
 
@@ -24,9 +28,21 @@ class QQDrawing:
 	"""
 	Custom drawing super-class, mostly for detection
 	"""
+	on_timeframe = True # see hide_wrong_tfs
+	culled = False # see Qraph.cull_drawings
+
 	def __init__(self, metadata=None):
 		self.metadata = metadata
-		# TODO: add the freq thing here probably.
+
+	@property
+	def freq(self):
+		return self._freq.name
+
+	@freq.setter
+	def freq(self, freq):
+		# parsed once here, so the timeframe checks below are integer comparisons.
+		# None (e.g. Qraph.current_freq() before any chart) gets the constructors' default
+		self._freq = get_freq('1Y' if freq is None else freq)
 
 	def appear_active(self):
 		raise NotImplementedError
@@ -34,98 +50,151 @@ class QQDrawing:
 		raise NotImplementedError
 
 	def hide_wrong_tfs(self, freq):
-		if freq == self.freq:
-			if self.isVisible():
-				return
-			else:
-				self.show() #TODO: check if this check
-				return
-		# TODO: potential performance optimization: store secs in current freq
-		if secs_in_freq(freq) > secs_in_freq(self.freq):
-			self.hide()
-		else:
-			self.show()
+		# only shown on its own timeframe and lower ones
+		self.set_on_timeframe(get_freq(freq).secs <= self._freq.secs)
+
+	def set_on_timeframe(self, on_timeframe):
+		self.on_timeframe = on_timeframe
+		self._update_visibility()
+
+	def set_culled(self, culled):
+		self.culled = culled
+		self._update_visibility()
+
+	def _update_visibility(self):
+		# shown on the right timeframes, unless culled
+		visible = self.on_timeframe and not self.culled
+		if visible != self.isVisible():
+			self.setVisible(visible)
 
 	@property
 	def best_x_position(self):
 		raise NotImplementedError
 
+	@property
+	def x_extent(self):
+		# (leftmost, rightmost) x it covers
+		return self.best_x_position, self.best_x_position
+
 class CandlesticksItem(pg.GraphicsObject):
-	def __init__(self, price_action, style='price_action', regularly_update=False):
+	def __init__(self, price_action, style='price_action', regularly_update=False, resample_engine=None,
+				 process_resampler=None):
 		pg.GraphicsObject.__init__(self)
+		self.resample_engine = resample_engine # see resampling.ENGINES, None uses the default
+		self.process_resampler = process_resampler # optional process_resampling.ProcessResampler for warm-up
 		self.ltf_increment_treshold = 50 #num candles
 		self.htf_increment_treshold = 800 #num candles
-		self.freqs = ['1min', '5min', '15min', '1h', '4h', '1d', '1w', '1m', '1y']
+		self.freqs = list(STANDARD_FREQS)
 		self.regularly_update = regularly_update
 		self.cached_resamples = {} 
 		# ^^ because it's impossible to clear the cache for a single instance
 		# of a class and I suspect lru_cache blocks parallel calculation of
 		# cached values for distinct instances of the same class
+		self.cached_pas = {} # resampled price actions, used as the sources for higher freqs
+		self.resample_sources = {} # freq of each cached pa -> the freq it was resampled from
+		self.cache_lock = threading.Lock() # guards publishing into the caches above
+		self.warmup_token = WarmupToken() # replaced whenever the data changes, see reduce_future_lag
+		self.tile_size = 128 #num candles
+		self.tile_cache = CandleTileCache(self.tile_size)
+		self.live_candle = None # LiveCandleItem that draws the last candle instead of the tiles, see there
 
 		self.initial_pa = price_action
 		self.freq = self.initial_pa.resolution
-		self.uncut_data, self.uncut_log_data = self._memoized_resample(self.freq) #inefficient to do this here.
-		self.absolute_start = self.initial_pa.data.index[0].value/ 10**9
-		self.absolute_end = self.initial_pa.data.index[-1].value/ 10**9 # used for performance enchancement during cutting
+		self.uncut_data = self._memoized_resample(self.freq) #inefficient to do this here.
+		self.absolute_start = self.initial_pa[0].time
+		self.absolute_end = self.initial_pa[-1].time # used for performance enchancement during cutting
 
 		self.reset_available_freqs(self.initial_pa)
 
 		self.log_mode = [False, False]
 		# TODO: should the reduced window be set here? look for clues in PlotDataItem.
 
-		if self.regularly_update:
-			self.updater_thread = _thread.start_new_thread(self.regularly_update_chart, ())
-
-		_thread.start_new_thread(self.reduce_future_lag, ())
-
-
+		self.setFlag(self.GraphicsItemFlag.ItemUsesExtendedStyleOption) # so paint gets the exposed rect
 		self.set_style(style)
 		self.initial_resample() #< gen data here
 		self.generatePicture()
 
-	def regularly_update_chart(self):
-		while self.regularly_update:
-			print('regularly updating!')
-			self.get_newest_candles()
-			time.sleep(60)
-
-	def get_newest_candles(self):
-		self.initial_pa.update()
+		if self.regularly_update:
+			shared_scheduler().subscribe(self) # one thread for all live charts, see live_scheduler
+		self.reduce_future_lag() # after initial_resample, so the freqs near the shown one go first
+
+	def append_candles(self, candles):
+		# in the gui thread. warm-up jobs reading the old candles are cancelled
+		# first, so none of them publishes what it read while they changed
+		with self.cache_lock:
+			self.warmup_token.cancel()
+		self.apply_new_candles(self.initial_pa.append(candles))
+
+	def merge_candles(self, candles):
+		# in the gui thread, like append_candles, e.g. the backfilled gaps (see LiveScheduler.backfill)
+		with self.cache_lock:
+			self.warmup_token.cancel()
+		first_changed = self.initial_pa.store.merge(candles)
+		if first_changed < len(self.initial_pa):
+			self.apply_new_candles(first_changed)
+
+	def apply_new_candles(self, first_changed):
+		"""
+		Updates the cached resamples in place after the base candles from index
+		first_changed on changed (or were appended): each freq recomputes only
+		its last buckets from its own pyramid source.
+		"""
+		stores = {self.initial_pa.resolution: self.initial_pa.store}
+		with self.cache_lock:
+			# running warm-up jobs may have read the old candles, they must not publish
+			self.warmup_token.cancel()
+			self.warmup_token = WarmupToken()
+			changed = {self.initial_pa.resolution: first_changed}
+			for freq in sorted(self.cached_pas, key=secs_in_freq): # sources come before what's resampled from them
+				source_freq = self.resample_sources.get(freq)
+				if source_freq not in changed:
+					# nothing to update it from, leave it to the warm-up
+					del self.cached_pas[freq]
+					self.cached_resamples.pop(freq, None)
+					self.tile_cache.drop_from(freq, 0, 0)
+					continue
+				source_pa = self.initial_pa if source_freq == self.initial_pa.resolution else self.cached_pas[source_freq]
+				changed[freq] = resample_tail(self.cached_pas[freq].store, source_pa.store, changed[source_freq],
+											  freq, self.resample_engine)
+				stores[freq] = self.cached_pas[freq].store
+		for freq, first_changed_candle in changed.items():
+			self.tile_cache.drop_from(freq, first_changed_candle, self.drawn_length(stores[freq]))
+		self.absolute_end = self.initial_pa[-1].time
+
+		self.uncut_data = self._memoized_resample(self.freq)
+		if self.following_end:
+			self.set_window(slice(self.window.start, len(self.uncut_data)))
+		self.data = self.uncut_data[self.window] # the old views may point into outgrown buffers
+		if len(self.data) != 0:
+			self.current_end = self.data.time[-1] + secs_in_freq(self.freq)
+		self.generatePicture()
+		self.update()
+		self.reduce_future_lag() # the freqs that weren't cached yet
 
-		self.cached_resamples = {} #clear the cache
-		if self.regularly_update: # redues the probability of it throwing a C++ error in the case of a race condition
-			_thread.start_new_thread(self.reduce_future_lag, ())
-   		# HERE: there is no pa DATA sometimes after the first resample
-   		# if len(self.pa.data) > 2:
-   		#	  self.resample(self.pa.resolution, (self.pa.data.index[0].value/ 10**9, self.pa.data.index[-1].value/ 10**9))
+	def set_window(self, window):
+		self.window = window # indices of data in uncut_data
+		# taken now, since the base store (uncut_data at the base freq) has already grown by apply_new_candles
+		self.following_end = window.stop >= len(self.uncut_data)
 
 	def reset_available_freqs(self, pa):
 		#TODO: initial pa?
-		if not (pa.resolution in self.freqs):
-			self.add_freq_in_proper_place(pa.resolution)
-		self.freqs = self.freqs[self.freqs.index(pa.resolution):]
+		self.freqs = freqs_from(self.freqs, pa.resolution)
 
 	def add_freq_in_proper_place(self, custom_freq):
 		print(f'adding {custom_freq}')
-		for index, freq in enumerate(self.freqs):
-			left_freq = secs_in_freq(freq)
-			right_freq = secs_in_freq(self.freqs[index+1]) if index < (len(self.freqs)-1) else np.inf
-			if left_freq < secs_in_freq(custom_freq) < right_freq:
-				self.freqs.insert(index+1, custom_freq)
-				return
-		raise ValueError(custom_freq)
+		insert_freq(self.freqs, custom_freq)
 
 	def initial_resample(self):
 		# so there's an adequate amount of candles when it first spawn
-		start = self.initial_pa[0].time.astype(int)/ 10**9
-		end = self.initial_pa[-1].time.astype(int)/ 10**9
+		start = self.initial_pa[0].time
+		end = self.initial_pa[-1].time
 		self.resample_to_interval_abrupt((start, end))
 
 		self.data = self.uncut_data
-		self.log_data = self.uncut_log_data
+		self.set_window(slice(0, len(self.uncut_data)))
 
-		self.current_start = self.data[0][0]
-		self.current_end = self.log_data[-1][0]
+		self.current_start = self.data.time[0]
+		self.current_end = self.data.time[-1]
 
 	def resample_to_interval_abrupt(self, interval):
 		"""
@@ -170,19 +239,46 @@ class CandlesticksItem(pg.GraphicsObject):
 	def reduce_future_lag(self):
 		print(f'pa label: {self.initial_pa.label}')
 		# resamples PA in every (reasonable) possible way in advance, thus
-		# saving it to memory
-		for freq in self.freqs:
-			self._memoized_resample(freq)
+		# saving it to memory. runs on the shared warm-up executor, freqs
+		# nearest to the current one first.
+		executor = shared_executor()
+		current_index = self.freqs.index(self.freq) if self.freq in self.freqs else 0
+		token = self.warmup_token
+		if self.process_resampler:
+			executor.submit(0, token, self._warm_up_in_processes, token)
+			return
+		for index, freq in enumerate(self.freqs):
+			executor.submit(abs(index - current_index), token, self._memoized_resample, freq, token)
+
+	def _warm_up_in_processes(self, token):
+		# every missing freq is resampled on its own core
+		missing_freqs = [freq for freq in self.freqs if freq not in self.cached_resamples]
+		unresampled_freqs = [freq for freq in missing_freqs
+							 if freq != self.initial_pa.resolution and freq not in self.cached_pas]
+		resampled = self.process_resampler.resample(self.initial_pa.store, unresampled_freqs)
+		for freq, store in resampled.items():
+			self._publish(freq, OHLCPriceAction(store, freq, self.initial_pa.label), token, self.initial_pa.resolution)
+		if token.cancelled:
+			return
+		for freq in missing_freqs:
+			self._memoized_resample(freq, token) # all in cached_pas by now
+
+	def pre_exit_sequence(self):
+		# stops updating and drops the queued warm-up jobs of this chart
+		self.regularly_update = False
+		shared_scheduler().unsubscribe(self)
+		self.warmup_token.cancel()
 
 	def _resample(self, freq):
 		if freq == self.freq:
 			return
-		self.uncut_data, self.uncut_log_data = self._memoized_resample(freq)
-		self.data, self.log_data = self.uncut_data, self.uncut_log_data
+		self.uncut_data = self._memoized_resample(freq)
+		self.data = self.uncut_data
+		self.set_window(slice(0, len(self.uncut_data)))
 		# for performance enchancement for cutting:
 		if len(self.uncut_data) != 0:
-			current_start = self.uncut_data[0][0]
-			current_end = self.uncut_data[-1][0]
+			current_start = self.uncut_data.time[0]
+			current_end = self.uncut_data.time[-1]
 			self.current_start = current_start - secs_in_freq(self.freq) # because resampling breaks the boundaries
 			self.current_end = current_end + secs_in_freq(self.freq) # because resampling breaks the boundaries
 
@@ -233,32 +329,27 @@ class CandlesticksItem(pg.GraphicsObject):
 		self._resample(newfreq)
 
 	def _cut(self, start, end):
-		#TODO: everything can be faster by using a lighter pa object representation
-		start = np.datetime64(int(start), 's').astype('<M8[m]')
-		end = np.datetime64(int(end), 's').astype('<M8[m]')
+		# bounds are whole minutes, the window is found by bisection and is a view
+		start = int(start) // 60 * 60
+		end = int(end) // 60 * 60
 		candle_size = secs_in_freq(self.freq)
+		first_time, last_time = self.absolute_start, self.absolute_end
 
-		if not start < self.initial_pa[0].time:
-			start = start - np.timedelta64(self.htf_increment_treshold * candle_size, 's')
-		if not end > self.initial_pa[-1].time:
-			end = end + np.timedelta64(self.htf_increment_treshold * candle_size, 's')
-
-		if start < self.initial_pa[0].time: #vajadzīgs, jo indeksējot ar pd.Timestamp, nevar pāršaut indeksus.
-			start = self.initial_pa[0].time.astype(int)/ 10**9
-		if end > self.initial_pa[-1].time or (end.astype('datetime64[Y]').astype(int) + 1970 > 2030): #TODO: FIX THIS BLSHIT
-			end = self.initial_pa[-1].time.astype(int)/ 10**9
-
-		start = start.astype('datetime64[s]').astype('int')
-		end = end.astype('datetime64[s]').astype('int')
+		if not start < first_time:
+			start = start - self.htf_increment_treshold * candle_size
+		if not end > last_time:
+			end = end + self.htf_increment_treshold * candle_size
 
+		start = max(start, first_time)
+		end = min(end, last_time)
 
-		self.data = self.uncut_data[(start<self.uncut_data[:,0])&(self.uncut_data[:,0]<end)]
-		self.log_data = self.uncut_log_data[(start<self.uncut_log_data[:,0])&(self.uncut_log_data[:,0]<end)]
+		self.set_window(self.uncut_data.window_indices(start, end))
+		self.data = self.uncut_data[self.window]
 
 		# for performance enchancement for cutting:
 		if len(self.data) != 0:
-			current_start = self.data[0][0]
-			current_end = self.data[-1][0]
+			current_start = self.data.time[0]
+			current_end = self.data.time[-1]
 			self.current_start = current_start - secs_in_freq(self.freq) #because resampling breaks the boundaries
 			self.current_end = current_end + secs_in_freq(self.freq) # because resampling breaks the boundaries
 
@@ -280,19 +371,53 @@ class CandlesticksItem(pg.GraphicsObject):
 				self.generatePicture()
 
 
-	def _memoized_resample(self, freq):
-		# return data and log data:
-		if freq not in self.cached_resamples.keys():
-			if freq == self.initial_pa.resolution:
-				pa = self.initial_pa
-			else:
-				pa = self.initial_pa.resample(freq, cut_partial_candles=False)
-			data = reformat_pa_data(pa) ## data must have fields: time, open, high, low, close
-			log_data = self.generate_log_data(data)
-
-			self.cached_resamples[freq] = (data, log_data)
-		return self.cached_resamples[freq]
-
+	def _memoized_resample(self, freq, token=None):
+		# log data is not cached, see render_tile
+		# token is given by warm-up jobs, whose results are only published if
+		# the data didn't change in the meantime.
+		if freq == self.initial_pa.resolution:
+			return self.initial_pa.store
+		store = self.cached_resamples.get(freq)
+		if store is None:
+			store = self._memoized_resample_pa(freq, token).store # shared with the price action, not copied
+		return store
+
+	def _memoized_resample_pa(self, freq, token=None):
+		# resampling pyramid: each freq is resampled from the closest lower freq
+		# that divides it (5min from 1min, 15min from 5min, ...), so only the
+		# first step has to go through the whole base data.
+		if freq == self.initial_pa.resolution:
+			return self.initial_pa
+		pa = self.cached_pas.get(freq)
+		if pa is None:
+			source_freq = self._resample_source(freq)
+			pa = self.initial_pa.cached_level(freq) # e.g. from an archive, see ArchivedPriceAction
+			if pa is None:
+				source_pa = self._memoized_resample_pa(source_freq, token)
+				pa = source_pa.resample(freq, cut_partial_candles=False, engine=self.resample_engine)
+			pa = self._publish(freq, pa, token, source_freq)
+		return pa
+
+	def _publish(self, freq, pa, token, source_freq):
+		# the price action and its store go into the caches together, and the
+		# first one published for a freq stays: the gui thread and a warm-up job
+		# resampling the same freq both end up with that one (returned).
+		with self.cache_lock:
+			if freq in self.cached_pas:
+				return self.cached_pas[freq]
+			if token is None or not token.cancelled:
+				self.cached_pas[freq] = pa
+				self.cached_resamples[freq] = pa.store
+				self.resample_sources[freq] = source_freq
+		return pa
+
+	def _resample_source(self, freq):
+		freq = get_freq(freq)
+		lower_freqs = [f for f in self.freqs if get_freq(f) < freq]
+		for source_freq in reversed(lower_freqs):
+			if source_freq != self.initial_pa.resolution and get_freq(source_freq).divides(freq):
+				return source_freq
+		return self.initial_pa.resolution # custom freqs that nothing divides
 
 	def set_style(self, style):
 		self.style = style
@@ -309,41 +434,62 @@ class CandlesticksItem(pg.GraphicsObject):
 		# adapted from PlotDataItem applyLogMapping
 		if len(data) == 0:
 			return data
-		log_data = data.copy()
-		log_data[0] = data[0]
 		with warnings.catch_warnings():
 			warnings.simplefilter("ignore", RuntimeWarning)
-			log_data[:,1] = np.log10(data[:,1])
-			log_data[:,2] = np.log10(data[:,2])
-			log_data[:,3] = np.log10(data[:,3])
-			log_data[:,4]= np.log10(data[:,4])
-		return log_data
+			# time and volume are shared with data, not copied
+			return CandleStore(data.time, np.log10(data.open), np.log10(data.high),
+							   np.log10(data.low), np.log10(data.close), data.volume)
 
 	def generatePicture(self):
 		# "pre-computing a QPicture object allows paint() to run much more quickly,
 		# rather than re-drawing the shapes every time."
-		self.picture = QtGui.QPicture()
-		p = QtGui.QPainter(self.picture)
-		p.setPen(self.wick_pen)
-		data = self.data if not self.log_mode[1] else self.log_data
-		w = secs_in_freq(self.freq)/3#(width)
-		for (time, open, high, low, close) in data:
-			p.drawLine(QtCore.QPointF(time, low), QtCore.QPointF(time, high))
-			if open > close:
-				p.setBrush(self.down_candle_brush)
-			else:
-				p.setBrush(self.up_candle_brush)
-			p.drawRect(QtCore.QRectF(time-w, open, w*2, close-open))
-		p.end()
-		#TODO: if no wicks at all, it draws a weird vertical line that's infinite (in log scale); get rid of that.
-	def paint(self, p, *args):
-		p.drawPicture(0, 0, self.picture)
+		# the candles are split into tiles of tile_size candles per freq, which are
+		# rendered once and kept in tile_cache, so panning only renders new tiles.
+		log = self.log_mode[1]
+		first_tile = self.window.start // self.tile_size
+		last_tile = (min(self.window.stop, self.drawn_length(self.uncut_data)) - 1) // self.tile_size
+		tiles = [self.tile_cache.get((self.freq, log, index), lambda index=index: self.render_tile(index, log))
+				 for index in range(first_tile, last_tile + 1)]
+		# all-NaN tiles (holes in the data) have nothing to draw and a null rect, which would unsort the edges below
+		self.tiles = [tile for tile in tiles if not tile.rect.isNull()]
+		bounding_rect = QtCore.QRectF()
+		for tile in self.tiles:
+			bounding_rect = bounding_rect.united(tile.rect)
+		# tiles are sorted and don't overlap in time, see paint
+		self.tile_lefts = np.array([tile.rect.left() for tile in self.tiles])
+		self.tile_rights = np.array([tile.rect.right() for tile in self.tiles])
+		self.prepareGeometryChange()
+		self.bounding_rect = bounding_rect
+		if self.live_candle is not None:
+			self.live_candle.sync()
+
+	def drawn_length(self, data):
+		# number of candles of data the tiles draw, the live candle draws the last one
+		return max(len(data) - (self.live_candle is not None), 0)
+
+	def render_tile(self, index, log):
+		stop = min((index + 1) * self.tile_size, self.drawn_length(self.uncut_data))
+		data = self.uncut_data[index * self.tile_size:stop]
+		if log:
+			# only the candles of tiles that actually get shown in log mode are ever logged
+			data = self.generate_log_data(data)
+		tile = CandleTile(data, secs_in_freq(self.freq)/3, self.wick_pen, self.up_candle_brush, self.down_candle_brush)
+		tile.stop = stop # one past its last candle, see CandleTileCache.drop_from
+		return tile
+
+	def paint(self, p, option, *args):
+		# only the tiles in the exposed rect are drawn, so the overscan around the
+		# view (see _cut) doesn't cost anything
+		exposed = option.exposedRect
+		first = np.searchsorted(self.tile_rights, exposed.left(), side='left')
+		last = np.searchsorted(self.tile_lefts, exposed.right(), side='right')
+		for tile in self.tiles[first:last]:
+			p.drawPicture(0, 0, tile.picture)
 
 	def boundingRect(self):
 		# "boundingRect _must_ indicate the entire area that will be drawn on
-		# or else we will get artifacts and possibly crashing.
-		# (in this case, QPicture does all the work of computing the bouning rect for us)"
-		return QtCore.QRectF(self.picture.boundingRect())
+		# or else we will get artifacts and possibly crashing."
+		return self.bounding_rect
 
 	def setLogMode(self, x, y):
 		"""
@@ -360,6 +506,8 @@ class CandlesticksItem(pg.GraphicsObject):
 		if x == True:
 			raise NotImplementedError
 		self.log_mode = [x, y]
+		if not y:
+			self.tile_cache.drop_log_tiles()
 		self.generatePicture()
 
 	def save_object(self):
@@ -373,6 +521,84 @@ class CandlesticksItem(pg.GraphicsObject):
 		pa = pa_class.gen_from_save_object(o['pa_data'])
 		return CandlesticksItem(pa, o['style'])
 
+class LiveCandleItem(pg.GraphicsObject):
+	"""
+	Draws only the last (in-progress) candle of a CandlesticksItem, which leaves
+	it out of its tiles from then on. An update of that candle only repaints its
+	rect, so it can come as often as it likes without touching the historical
+	candles.
+	Also subscribes the chart to the live scheduler, which fetches its new candles.
+	"""
+
+	def __init__(self, chart, regularly_update=True, update_interval=None):
+		pg.GraphicsObject.__init__(self)
+		self.chart = chart
+		self.regularly_update = regularly_update
+		self.update_interval = update_interval or chart.initial_pa.update_interval #seconds
+		self.log = False
+		self.candle = None # candle_store.Candle at chart.freq
+		self.rect = QtCore.QRectF()
+
+		chart.live_candle = self
+		chart.tile_cache.clear() # the tiles drawing the last candle are stale now
+		chart.generatePicture() # syncs this
+
+		if self.regularly_update:
+			shared_scheduler().subscribe(chart, self.update_interval) # the chart syncs this on new candles
+
+	def pre_exit_sequence(self):
+		self.regularly_update = False
+		shared_scheduler().unsubscribe(self.chart)
+
+	def sync(self):
+		# takes over the chart's last candle, e.g. after new candles or a resample
+		data = self.chart.uncut_data
+		self.candle = data[-1] if len(data) != 0 else None
+		self._update_geometry()
+
+	def _mapped_candle(self):
+		candle = self.candle
+		prices = np.array([candle.open, candle.high, candle.low, candle.close])
+		if self.log:
+			with warnings.catch_warnings():
+				warnings.simplefilter("ignore", RuntimeWarning)
+				prices = np.log10(prices)
+		return (float(candle.time),) + tuple(prices)
+
+	def _update_geometry(self):
+		rect = QtCore.QRectF()
+		if self.candle is not None:
+			time, _, high, low, _ = self._mapped_candle()
+			half_width = secs_in_freq(self.chart.freq)/3
+			if np.isfinite(low) and np.isfinite(high):
+				rect = QtCore.QRectF(time - half_width, low, 2*half_width, high - low)
+		if rect != self.rect:
+			self.prepareGeometryChange() # repaints the old rect too
+			self.rect = rect
+		self.update(self.rect) # only the candle's rect is repainted
+
+	def paint(self, p, *args):
+		if self.candle is None:
+			return
+		time, open, high, low, close = self._mapped_candle()
+		half_width = secs_in_freq(self.chart.freq)/3
+		chart = self.chart
+		p.setPen(chart.wick_pen)
+		if np.isfinite(low) and np.isfinite(high):
+			p.drawLine(QLineF(time, low, time, high))
+		if np.isfinite(open) and np.isfinite(close):
+			p.setBrush(chart.down_candle_brush if open > close else chart.up_candle_brush)
+			p.drawRect(QtCore.QRectF(time - half_width, open, 2*half_width, close - open))
+
+	def boundingRect(self):
+		return self.rect
+
+	def setLogMode(self, x, y):
+		if x == True:
+			raise NotImplementedError
+		self.log = y
+		self._update_geometry()
+
 class QQFieldItem(pg.GraphicsObject):
 	def __init__(self, data, brush = pg.mkBrush('r')):
 		pg.GraphicsObject.__init__(self)
@@ -466,6 +692,11 @@ class QQRRItem(pg.GraphicsObject, QQDrawing):
 	def best_x_position(self):
 		return (self.p1.x + self.p2.x + self.p3.x)/3
 
+	@property
+	def x_extent(self):
+		xs = (self.p1.x, self.p2.x, self.p3.x)
+		return min(xs), max(xs)
+
 	def label(self, p2x, p2y):
 		return f'simR/R: {self.sim_rr(p2x, p2y)}'
 
@@ -546,22 +777,82 @@ class QQRRItem(pg.GraphicsObject, QQDrawing):
 			item.metadata = o['metadata']
 		return item
 
-def reformat_pa_data(pa):
-# 	pa.data.index.astype(int)/ 10**9  # < does this have no effect
-	pa = pa.data.reset_index()
-	pa.time = pa.time.astype(int)/ 10**9
-	pa = pa[['time', 'open', 'high', 'low', 'close']]
-	pa = pa.values
-	return pa
+class CandleTile:
+	"""
+	Pre-rendered picture of a run of candles, plus the rect it covers
+	"""
+	def __init__(self, data, half_width, wick_pen, up_candle_brush, down_candle_brush):
+		self.picture = QtGui.QPicture()
+		p = QtGui.QPainter(self.picture)
+		p.setPen(wick_pen)
+		time = data.time.astype(np.float64)
+		p.drawPath(candle_wicks_path(time, data.low, data.high))
+		down = data.open > data.close
+		p.setBrush(up_candle_brush)
+		p.drawPath(candle_bodies_path(time[~down], data.open[~down], data.close[~down], half_width))
+		p.setBrush(down_candle_brush)
+		p.drawPath(candle_bodies_path(time[down], data.open[down], data.close[down], half_width))
+		p.end()
+		#TODO: if no wicks at all, it draws a weird vertical line that's infinite (in log scale); get rid of that.
 
-def timedelta_from_freq(freq):
-	freq = pd.tseries.frequencies.to_offset(freq)
-	common_dt = pd.to_datetime("2016-07-31")
-	return common_dt + freq - common_dt
+		finite = np.isfinite(data.low) & np.isfinite(data.high)
+		if finite.any():
+			low, high = data.low[finite].min(), data.high[finite].max()
+			self.rect = QtCore.QRectF(time[0] - half_width, low, time[-1] - time[0] + 2*half_width, high - low)
+		else:
+			self.rect = QtCore.QRectF() # null, nothing drawn
 
-def secs_in_freq(freq):
-	timedelta = timedelta_from_freq(freq)
-	return int(timedelta/pd.Timedelta('1s'))
+class CandleTileCache:
+	"""
+	Bounded LRU cache of CandleTiles, keyed by (freq, log mode, tile index)
+	"""
+	def __init__(self, tile_size, max_tiles=1024):
+		self.tile_size = tile_size
+		self.max_tiles = max_tiles
+		self.tiles = OrderedDict()
+
+	def get(self, key, render):
+		if key in self.tiles:
+			self.tiles.move_to_end(key)
+			return self.tiles[key]
+		tile = render()
+		self.tiles[key] = tile
+		if len(self.tiles) > self.max_tiles:
+			self.tiles.popitem(last=False)
+		return tile
+
+	def drop_from(self, freq, first_changed, length):
+		# tiles of freq that draw candles from index first_changed on, or that
+		# would draw a different number of candles now that length of them are drawn
+		def stale(key, tile):
+			return tile.stop > first_changed or (tile.stop < (key[2] + 1) * self.tile_size and tile.stop != length)
+		for key in [key for key, tile in self.tiles.items() if key[0] == freq and stale(key, tile)]:
+			del self.tiles[key]
+
+	def drop_log_tiles(self):
+		for key in [key for key in self.tiles if key[1]]:
+			del self.tiles[key]
+
+	def clear(self):
+		self.tiles.clear()
+
+def candle_wicks_path(time, low, high):
+	# one (low, high) line segment per candle
+	finite = np.isfinite(low) & np.isfinite(high)
+	time, low, high = time[finite], low[finite], high[finite]
+	xs = np.repeat(time, 2)
+	ys = np.column_stack((low, high)).ravel()
+	return pg.arrayToQPath(xs, ys, connect='pairs', finiteCheck=False)
+
+def candle_bodies_path(time, open, close, half_width):
+	# one closed rectangle (5 points) per candle
+	finite = np.isfinite(open) & np.isfinite(close)
+	time, open, close = time[finite], open[finite], close[finite]
+	left, right = time - half_width, time + half_width
+	xs = np.column_stack((left, right, right, left, left)).ravel()
+	ys = np.column_stack((open, open, close, close, open)).ravel()
+	connect = np.tile(np.array([1, 1, 1, 1, 0], dtype=np.int32), len(time))
+	return pg.arrayToQPath(xs, ys, connect=connect, finiteCheck=False)
 
 class QQInteractiveFieldItem(pg.GraphicsObject):
 	# NOT finished IMPLEMENTing bc not that important
@@ -768,6 +1059,10 @@ class Trendline(pg.GraphicsObject, QQDrawing): #or graphicsobject? or neiter? no
 	def best_x_position(self):
 		return (self.start.x + self.end.x)/2
 
+	@property
+	def x_extent(self):
+		return min(self.start.x, self.end.x), max(self.start.x, self.end.x)
+
 	def appear_active(self):
 		active_pen = pg.mkPen('r', width=4, style=QtCore.Qt.DashLine)
 		self.line.setPen(active_pen)
@@ -862,6 +1157,10 @@ class LineSystem(pg.GraphicsObject, QQDrawing):
 	def best_x_position(self):
 		return self.trendline.best_x_position
 
+	@property
+	def x_extent(self):
+		return self.trendline.x_extent
+
 	def appear_active(self):
 		self.trendline.appear_active()
 		for parallel in self.parallels:
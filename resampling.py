@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries import offsets
+
+from candle_store import CandleStore
+
+# the numpy engine reproduces pandas' default resample binning:
+# * tick freqs (min, h, d) are closed/labelled left, with bins anchored to the
+#   midnight of the first candle (origin='start_day')
+# * week, month and year ends are closed/labelled right, the label being the
+#   midnight of the last day of the bin.
+# anything else (multiples of anchored offsets, business days, etc.) falls back to pandas.
+ENGINES = ('numpy', 'pandas')
+DEFAULT_ENGINE = 'numpy'
+
+SECS_IN_DAY = 86400
+EPOCH_WEEKDAY = 3 # 1970-01-01 was a thursday
+
+def bucket_edges(times, freq, origin=None):
+	"""
+	Returns (edges, labels) for the buckets spanning sorted epoch second times,
+	where bucket k holds edges[k] <= time < edges[k+1] and is labelled labels[k],
+	or None if the numpy engine can't express freq.
+	Only the first and last time are looked at. Tick freq buckets are anchored
+	to origin, by default the midnight before the first time.
+	"""
+	offset = pd.tseries.frequencies.to_offset(freq)
+	first, last = int(times[0]), int(times[-1])
+	if isinstance(offset, offsets.Tick):
+		if offset.nanos % 10**9 != 0:
+			return None
+		step = offset.nanos // 10**9
+		if origin is None:
+			origin = first - first % SECS_IN_DAY
+		first_id, last_id = (first - origin) // step, (last - origin) // step
+		edges = origin + np.arange(first_id, last_id + 1, dtype=np.int64) * step
+		labels = edges
+	elif isinstance(offset, offsets.Week) and offset.n == 1 and offset.weekday is not None:
+		def label_day(t):
+			day = t // SECS_IN_DAY
+			return day + (offset.weekday - (day + EPOCH_WEEKDAY)) % 7
+		label_days = np.arange(label_day(first), label_day(last) + 1, 7, dtype=np.int64)
+		edges = (label_days - 6) * SECS_IN_DAY
+		labels = label_days * SECS_IN_DAY
+	elif isinstance(offset, offsets.MonthEnd) and offset.n == 1:
+		months = np.arange(_month(first), _month(last) + 1, dtype=np.int64)
+		edges = _month_start(months)
+		labels = _month_start(months + 1) - SECS_IN_DAY
+	elif isinstance(offset, offsets.YearEnd) and offset.n == 1:
+		def end_month(t):
+			month = _month(t)
+			return month + (offset.month - 1 - month % 12) % 12
+		end_months = np.arange(end_month(first), end_month(last) + 1, 12, dtype=np.int64)
+		edges = _month_start(end_months - 11)
+		labels = _month_start(end_months + 1) - SECS_IN_DAY
+	else:
+		return None
+	return edges, labels
+
+def _month(t):
+	# months since epoch
+	return int(np.datetime64(t, 's').astype('datetime64[M]').astype(np.int64))
+
+def _month_start(months):
+	return months.astype('datetime64[M]').astype('datetime64[s]').astype(np.int64)
+
+def _segments(times, edges):
+	# times are sorted, so each bucket is a contiguous run found by bisection
+	bounds = np.append(np.searchsorted(times, edges), len(times))
+	filled = np.flatnonzero(bounds[1:] > bounds[:-1])
+	return bounds[filled], bounds[filled + 1], filled
+
+def resample_ohlcv(times, open, high, low, close, volume, freq, origin=None):
+	"""
+	Pure numpy OHLCV resampling over sorted int64 epoch second times.
+	Returns (labels, open, high, low, close, volume, counts) with one entry per
+	bucket between the first and last candle, empty buckets being NaN (0 volume),
+	exactly like pandas' resample().agg(), or None if freq is not supported.
+	"""
+	times = np.asarray(times, dtype=np.int64)
+	if len(times) == 0:
+		empty = np.empty(0)
+		return np.empty(0, dtype=np.int64), empty, empty, empty, empty, empty, np.empty(0, dtype=np.int64)
+
+	bucketed = bucket_edges(times, freq, origin)
+	if bucketed is None:
+		return None
+	edges, labels = bucketed
+	starts, ends, filled = _segments(times, edges)
+
+	def reduced(values, reduction, fill):
+		out = np.full(len(labels), fill, dtype=np.float64)
+		out[filled] = reduction(values, starts)
+		return out
+
+	high = reduced(high, np.fmax.reduceat, np.nan)
+	low = reduced(low, np.fmin.reduceat, np.nan)
+	volume = reduced(volume, np.add.reduceat, 0.)
+
+	present = ~np.isnan(close)
+	if not present.all():
+		# pandas first/last/count skip missing values, so do the same
+		times, open, close = times[present], open[present], close[present]
+		starts, ends, filled = _segments(times, edges)
+
+	opens = np.full(len(labels), np.nan)
+	opens[filled] = open[starts]
+	closes = np.full(len(labels), np.nan)
+	closes[filled] = close[ends - 1]
+	counts = np.zeros(len(labels), dtype=np.int64)
+	counts[filled] = ends - starts
+	return labels, opens, high, low, closes, volume, counts
+
+def resample_store_numpy(store, freq, origin=None):
+	# returns (resampled store, counts) or None if freq is not supported
+	resampled = resample_ohlcv(store.time, store.open, store.high, store.low, store.close, store.volume, freq, origin)
+	if resampled is None:
+		return None
+	return CandleStore(*resampled[:-1]), resampled[-1]
+
+def resample_store_pandas(store, freq):
+	ohlc_transform = {"open": "first", "high": "max", "low": "min",
+					  "close": "last", "volume": "sum"}
+	data = store.to_frame()
+	counts = data.close.resample(freq).count()
+	data = data.resample(freq).agg(ohlc_transform)
+	return CandleStore.from_frame(data), counts.values
+
+def resample_store(store, freq, engine=None):
+	"""
+	Resamples a CandleStore.
+	Returns (resampled store, number of source candles in each bucket).
+	"""
+	engine = engine or DEFAULT_ENGINE
+	assert engine in ENGINES, engine
+	if engine == 'numpy':
+		resampled = resample_store_numpy(store, freq)
+		if resampled is not None:
+			return resampled
+	return resample_store_pandas(store, freq)
+
+def resample_tail(resampled, source, first_changed, freq, engine=None):
+	"""
+	Updates resampled (source resampled to freq) in place, after the source
+	candles from index first_changed on were changed or appended: only the
+	buckets from the one holding the first changed candle on get recomputed.
+	Returns the index of the first changed candle of resampled.
+	"""
+	if first_changed >= len(source):
+		return len(resampled)
+	origin = source.time[0] - source.time[0] % SECS_IN_DAY # as in the full resample
+	bucketed = bucket_edges(source.time[first_changed:first_changed + 1], freq, origin)
+	if bucketed is None or len(resampled) == 0 or (engine or DEFAULT_ENGINE) != 'numpy':
+		# no way to find the bucket, resample it all
+		return resampled.append(resample_store(source, freq, engine)[0])
+	bucket_start = bucketed[0][0]
+	tail = source[np.searchsorted(source.time, bucket_start, side='left'):]
+	new_buckets, _ = resample_store_numpy(tail, freq, origin)
+	return resampled.append(new_buckets)
+
+def can_resample_from(freq, source_freq):
+	"""
+	True if every source_freq bucket lies entirely within one freq bucket,
+	so resampling already resampled source_freq data to freq gives the same
+	result as resampling the base data.
+	"""
+	offset = pd.tseries.frequencies.to_offset(freq)
+	source_offset = pd.tseries.frequencies.to_offset(source_freq)
+	if isinstance(source_offset, offsets.Tick):
+		source_step = source_offset.nanos
+		if isinstance(offset, offsets.Tick):
+			# both are anchored to the same midnight, see bucket_edges
+			return offset.nanos % source_step == 0
+		# calendar buckets are made of whole days
+		return (SECS_IN_DAY * 10**9) % source_step == 0
+	if isinstance(source_offset, offsets.MonthEnd) and source_offset.n == 1:
+		return isinstance(offset, offsets.YearEnd) and offset.n == 1
+	return False
@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+import pytest
+
+from candle_store import CandleStore
+from kline_fetcher import KlineFetcher, KLINE_LIMIT
+from kline_server import KlineServer
+from klines import klines_to_store
+from price_action import BinancePriceAction
+
+NUM_CANDLES = 4500 # several pages
+
+@pytest.fixture
+def full():
+	# random walk 1min candles
+	rng = np.random.default_rng(0)
+	time = 1704067200 + np.arange(NUM_CANDLES, dtype=np.int64) * 60
+	close = 40000 + np.cumsum(rng.normal(0, 5, NUM_CANDLES))
+	return CandleStore(time, close - 1, close + 5, close - 5, close, rng.random(NUM_CANDLES) * 10)
+
+@pytest.fixture
+def server(full):
+	server = KlineServer({('BTCUSDT', '1m'): full}).start()
+	yield server
+	server.stop()
+
+@pytest.fixture
+def fetcher(server):
+	fetcher = KlineFetcher(server.url)
+	yield fetcher
+	fetcher.close()
+
+def assert_same_candles(store, expected):
+	assert len(store) == len(expected)
+	assert np.array_equal(store.time, expected.time)
+	for column, expected_column in zip(store.columns[1:], expected.columns[1:]):
+		assert np.allclose(column, expected_column) # the server sends 8 decimals
+
+def test_fetch_across_pages(full, server, fetcher):
+	klines = fetcher.fetch('BTCUSDT', '1m', int(full.time[0]), int(full.time[-1]))
+	assert_same_candles(klines_to_store(klines), full)
+	assert server.requests == -(-NUM_CANDLES // KLINE_LIMIT) # one per page, none wasted
+
+def test_backfill_gaps(full, server, fetcher, tmp_path):
+	keep = np.ones(NUM_CANDLES, dtype=bool)
+	keep[100:160] = False # inside a page
+	keep[4000] = False # a single candle
+	keep[900:3100] = False # across pages
+	rows = server.klines('BTCUSDT', '1m', 0, 2**62, NUM_CANDLES)
+	kline_file = tmp_path / 'klines'
+	kline_file.write_text(json.dumps([row for row, kept in zip(rows, keep) if kept]))
+	pa = BinancePriceAction(str(kline_file), '1min', 'holes', 'BTCUSDT', fetcher=fetcher)
+	assert len(pa.gaps) == 3
+
+	assert pa.backfill_gaps() == 100
+	assert len(pa.gaps) == 0
+	assert_same_candles(pa.store, full)
+	assert pa.backfill_gaps() == len(pa) # nothing left to fetch
@@ -0,0 +1,71 @@
+import heapq
+import itertools
+import os
+import threading
+import traceback
+
+class WarmupToken:
+	"""
+	Handed out along with warm-up jobs. Cancelling it makes the queued jobs
+	stale (they are dropped) and tells running ones not to publish results.
+	"""
+	def __init__(self):
+		self.cancelled = False
+
+	def cancel(self):
+		self.cancelled = True
+
+class WarmupExecutor:
+	"""
+	A small, shared pool of worker threads for background warm-up work
+	(precomputing resamples). Jobs with the lowest priority run first; jobs
+	of equal priority run in submission order.
+	"""
+	def __init__(self, num_workers=2):
+		self.num_workers = num_workers
+		self.queue = []
+		self.counter = itertools.count()
+		self.condition = threading.Condition()
+		self.workers = []
+
+	def submit(self, priority, token, function, *args):
+		with self.condition:
+			if not self.workers:
+				self._start_workers()
+			heapq.heappush(self.queue, (priority, next(self.counter), token, function, args))
+			self.condition.notify()
+
+	def _start_workers(self):
+		for index in range(self.num_workers):
+			worker = threading.Thread(target=self._work, name=f'warmup-{index}', daemon=True)
+			worker.start()
+			self.workers.append(worker)
+
+	def _work(self):
+		while True:
+			with self.condition:
+				while not self.queue:
+					self.condition.wait()
+				_, _, token, function, args = heapq.heappop(self.queue)
+			if token.cancelled:
+				continue
+			try:
+				function(*args)
+			except Exception:
+				traceback.print_exc()
+
+	@property
+	def pending(self):
+		with self.condition:
+			return sum(not job[2].cancelled for job in self.queue)
+
+_shared_executor = None
+_shared_executor_lock = threading.Lock()
+
+def shared_executor():
+	# one executor for all charts, so opening more charts doesn't mean more threads
+	global _shared_executor
+	with _shared_executor_lock:
+		if _shared_executor is None:
+			_shared_executor = WarmupExecutor(num_workers=min(2, os.cpu_count() or 1))
+		return _shared_executor